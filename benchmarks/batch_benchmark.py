@@ -0,0 +1,103 @@
+"""
+Measure how /upload-batch scales with the number of worker processes.
+
+    python benchmarks/batch_benchmark.py                           # 8 invoices of 20k rows, 1..cpu_count processes
+    python benchmarks/batch_benchmark.py --invoices 16 --rows 50000 --processes 1 2 4
+
+Each run posts the same invoices to /upload-batch from a fresh process and a temporary copy of
+the project started with BATCH_PROCESSES set, then polls /batch-status until every file is done.
+The time includes starting the worker processes, as a first batch after a restart would.
+Speedup is relative to the run with the fewest processes.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, BENCHMARK_DIR)
+
+from generate_invoices import generate_invoice, write_invoice  # noqa: E402
+
+
+def measure(workdir, invoice_paths, processes):
+    """Convert the invoices as one batch in this process and print the seconds taken as JSON."""
+    os.environ['BATCH_PROCESSES'] = str(processes)
+    from run_benchmarks import load_app
+    app_module = load_app(workdir)
+    client = app_module.app.test_client()
+    files = [open(path, 'rb') for path in invoice_paths]
+    try:
+        start = time.perf_counter()
+        response = client.post('/upload-batch', data={'vendor': 'KAISI', 'files': files},
+                               content_type='multipart/form-data')
+    finally:
+        for file in files:
+            file.close()
+    batch_id = response.get_json()['batchId']
+    while True:
+        status = client.get(f'/batch-status/{batch_id}').get_json()
+        if status['completed'] + status['failed'] == status['total']:
+            break
+        time.sleep(0.05)
+    seconds = time.perf_counter() - start
+    app_module.batch_pool.shutdown()
+    print(json.dumps({'seconds': seconds, 'completed': status['completed'], 'failed': status['failed']}))
+
+
+def run(invoices, rows, processes_list):
+    workdir = tempfile.mkdtemp(prefix='invoice-batch-')
+    try:
+        invoice_paths = [
+            write_invoice(generate_invoice(rows, seed=number), os.path.join(workdir, f"kaisi_{number:03d}.csv"))
+            for number in range(invoices)
+        ]
+        results = {}
+        for processes in processes_list:
+            child = subprocess.run(
+                [sys.executable, __file__, '--measure', str(processes),
+                 '--workdir', os.path.join(workdir, f"app_{processes}"), '--paths', *invoice_paths],
+                check=True, capture_output=True, text=True,
+            )
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            result['speedup'] = results[processes_list[0]]['seconds'] / result['seconds'] if results else 1.0
+            results[processes] = result
+            print(f"{processes:>3} processes: {result['seconds']:8.2f}s  {result['speedup']:5.2f}x  "
+                  f"({result['completed']} completed, {result['failed']} failed)")
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--invoices', type=int, default=8, help='invoices per batch (default 8)')
+    parser.add_argument('--rows', type=int, default=20000, help='rows per invoice (default 20000)')
+    parser.add_argument('--processes', type=int, nargs='+',
+                        default=list(range(1, (os.cpu_count() or 1) + 1)),
+                        help='BATCH_PROCESSES values to try (default 1 to the number of CPUs)')
+    parser.add_argument('--json', help='also save the results to this file')
+    parser.add_argument('--measure', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    parser.add_argument('--paths', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.workdir, args.paths, args.measure)
+        return 0
+
+    results = run(args.invoices, args.rows, sorted(args.processes))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Generate synthetic KAISI-shaped invoices for benchmarking the conversion pipeline.
+
+    python benchmarks/generate_invoices.py --rows 1000 10000 100000 --format xlsx --out benchmarks/data
+"""
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outputWriters import write_frame  # noqa: E402
+
+PRODUCTS = [
+    'Rice Noodle', 'Soy Sauce', 'Green Tea', 'Chili Oil', 'Dumplings', 'Sesame Oil', 'Oyster Sauce',
+    'Instant Noodle', 'Jasmine Rice', 'Seaweed Snack', 'Fish Ball', 'Tofu Puff', 'Black Vinegar',
+    '米粉', '酱油', '绿茶', '辣椒油', '水饺', '香油', '蚝油', '方便面', '香米', '海苔', '鱼丸', '老陈醋',
+]
+BRANDS = ['Lee Kum Kee', 'Haitian', 'Nissin', 'Wei Chuan', 'Master Kong', '老干妈', '李锦记', '海天', '']
+SIZES = ['400g', '500ml', '1Kg', '250g', '2L', '100g', '5kg', '750ml', '']
+# Noise the description cleaning has to remove: carton marks, codes, numbering
+PREFIXES = ['', '', '', '1.', '12.', '#', '箱', 'P\\', '..']
+CODES = ['', '', '', ' 123', ' 907', ' .12.', ' .05.']
+MULTIPLIERS = ['', '', '*6', '*12', '*24', '*10*2', '*20', '*4*6', '*30']
+
+
+def ean13(bodies):
+    """Append the EAN-13 check digit to 12-digit bodies."""
+    digits = np.array([[int(c) for c in body] for body in bodies])
+    weights = np.tile([1, 3], 6)
+    checks = (10 - (digits * weights).sum(axis=1) % 10) % 10
+    return [f"{body}{check}" for body, check in zip(bodies, checks)]
+
+
+def generate_invoice(rows, seed=0):
+    """Return a DataFrame shaped like a KAISI e-invoice."""
+    rng = np.random.default_rng(seed)
+    # A catalogue of a few thousand products, so descriptions and barcodes repeat like real invoices
+    catalogue = min(max(rows // 5, 1), 5000)
+
+    def pick(options):
+        return np.array(options, dtype=object)[rng.integers(0, len(options), catalogue)]
+
+    descriptions = (
+        pick(PREFIXES) + pick(BRANDS) + ' ' + pick(PRODUCTS) + ' ' + pick(SIZES)
+        + pick(CODES) + pick(MULTIPLIERS)
+    )
+    descriptions = np.array([str(text).strip() for text in descriptions], dtype=object)
+    barcodes = np.array(ean13([f"69{n:010d}" for n in rng.integers(0, 10 ** 10, catalogue)]), dtype=object)
+    # Some suppliers print barcodes with dashes
+    dashed = rng.random(catalogue) < 0.1
+    barcodes[dashed] = [f"{code[:7]}-{code[7:]}" for code in barcodes[dashed]]
+    items = rng.integers(0, catalogue, rows)
+    qty = rng.integers(0, 48, rows)
+    price = np.round(rng.uniform(0.5, 600, rows), 2)
+    return pd.DataFrame({
+        'Barcode1': barcodes[items],
+        'Description1': descriptions[items],
+        'StockQty': qty,
+        'StockPrice': price,
+        'SalesPrice1': np.round(price * rng.uniform(1.1, 1.6, rows), 2),
+    })
+
+
+def write_invoice(df, path):
+    """Write an invoice as .xlsx or .csv, by extension."""
+    if path.endswith('.csv'):
+        df.to_csv(path, index=False, encoding='utf-8-sig')
+    else:
+        write_frame(df, path, 'xlsx')
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--format', choices=['xlsx', 'csv'], default='xlsx')
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for rows in args.rows:
+        path = os.path.join(args.out, f"kaisi_{rows}.{args.format}")
+        write_invoice(generate_invoice(rows, seed=args.seed), path)
+        print(f"Wrote {rows} rows to {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Measure the peak memory of streaming conversions on synthetic KAISI invoices of growing size.
+Streaming reads and writes a chunk at a time, so the peak should stay flat from 1k to 1M rows.
+
+    python benchmarks/memory_benchmark.py                          # 1k, 10k, 100k and 1M rows
+    python benchmarks/memory_benchmark.py --rows 1000 100000 --format xlsx
+
+Each conversion runs in its own process from a temporary copy of the project, with
+STREAMING_THRESHOLD_BYTES=0 so every invoice takes the streaming path, and reports its peak
+resident set size and how far that rose above the process after start-up.
+Exits with status 1 when the largest invoice grows the process by more than --tolerance MB
+beyond what the smallest one did.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, BENCHMARK_DIR)
+
+from generate_invoices import generate_invoice, write_invoice  # noqa: E402
+
+
+def max_rss_mb():
+    """Peak resident set size of this process so far, in MB."""
+    # ru_maxrss on Linux carries over the parent's peak through fork and exec; VmHWM does not
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(workdir, invoice_path, output_format):
+    """Convert one invoice in this process and print its memory use as JSON."""
+    os.environ['STREAMING_THRESHOLD_BYTES'] = '0'
+    from run_benchmarks import load_app
+    app_module = load_app(workdir)
+    started = max_rss_mb()
+    app_module.convert_file(invoice_path, os.path.join(workdir, f"memory_output.{output_format}"), vendor='KAISI')
+    peak = max_rss_mb()
+    print(json.dumps({'startup_mb': started, 'peak_mb': peak, 'growth_mb': peak - started}))
+
+
+def run(rows_list, invoice_format, output_format):
+    workdir = tempfile.mkdtemp(prefix='invoice-memory-')
+    try:
+        results = {}
+        for rows in rows_list:
+            invoice_path = write_invoice(generate_invoice(rows), os.path.join(workdir, f"kaisi_{rows}.{invoice_format}"))
+            child = subprocess.run(
+                [sys.executable, __file__, '--measure', invoice_path, '--workdir', os.path.join(workdir, str(rows)),
+                 '--output-format', output_format],
+                check=True, capture_output=True, text=True,
+            )
+            results[rows] = json.loads(child.stdout.strip().splitlines()[-1])
+            os.remove(invoice_path)
+            print(f"{rows:>8} rows: peak {results[rows]['peak_mb']:7.1f} MB, "
+                  f"{results[rows]['growth_mb']:+7.1f} MB over start-up")
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--format', choices=['xlsx', 'csv'], default='csv', help='format of the generated invoices')
+    parser.add_argument('--output-format', choices=['xlsx', 'csv', 'parquet'], default='xlsx')
+    parser.add_argument('--tolerance', type=float, default=100,
+                        help='allowed extra growth of the largest invoice over the smallest, in MB (default 100)')
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.workdir, args.measure, args.output_format)
+        return 0
+
+    results = run(sorted(args.rows), args.format, args.output_format)
+    smallest, largest = results[min(results)], results[max(results)]
+    extra = largest['growth_mb'] - smallest['growth_mb']
+    print(f"Largest invoice grew the process by {extra:+.1f} MB more than the smallest")
+    if extra > args.tolerance:
+        print(f"Memory is not flat: more than {args.tolerance:.0f} MB extra")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
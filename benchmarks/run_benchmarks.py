@@ -0,0 +1,182 @@
+"""
+Time each conversion stage and the end-to-end /upload on synthetic KAISI invoices,
+and compare the results with the recorded baseline.
+
+    python benchmarks/run_benchmarks.py                        # 1k, 10k and 100k rows
+    python benchmarks/run_benchmarks.py --rows 1000000 --repeat 1
+    python benchmarks/run_benchmarks.py --save-baseline        # record new baseline numbers
+
+The app runs from a temporary copy of the project, so uploads, outputs and databases
+never touch the working tree. Translation uses a fake in-process translator with the
+rate limit off, so the numbers measure the pipeline rather than Google Translate.
+Exits with status 1 when a stage is slower than the baseline by more than --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARK_DIR)
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+sys.path.insert(0, BENCHMARK_DIR)
+
+from generate_invoices import generate_invoice, write_invoice  # noqa: E402
+
+
+class FakeTranslator:
+    """Translate instantly, so only the pipeline's own work is timed."""
+
+    def translate_batch(self, texts, src, dest):
+        return [f"[{dest}] {text}" for text in texts]
+
+
+def copy_project(workdir):
+    """Copy the project to workdir without its uploads, outputs and databases."""
+    shutil.copytree(PROJECT_DIR, workdir, dirs_exist_ok=True, ignore=shutil.ignore_patterns(
+        '.git', 'benchmarks', 'uploads', 'processed', 'archive', '*.db', '*.db-*', '__pycache__'
+    ))
+
+
+def load_app(workdir):
+    """Import the app from a scratch copy of the project."""
+    copy_project(workdir)
+    os.environ.setdefault('TRANSLATION_RATE', '0')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    sys.path.insert(0, workdir)
+    import submitButtonHandling
+    submitButtonHandling.set_translation_backend(FakeTranslator())
+    return submitButtonHandling
+
+
+def reset_caches(app_module):
+    """Forget earlier translations and conversions, so every run does the full work."""
+    for store, table in ((app_module.translation_cache, 'translations'),
+                         (app_module.upload_history, 'conversions')):
+        with store._lock:
+            connection = store._connect()
+            connection.execute(f'DELETE FROM {table}')
+            connection.commit()
+
+
+def time_stages(app_module, invoice_path, output_path):
+    """Run the pipeline stage by stage and return the seconds each one took."""
+    from outputWriters import write_frame
+    timings = {}
+    start = time.perf_counter()
+    # The read path conversions use; the generated invoices have a single sheet
+    df = next(iter(app_module.read_invoice_sheets(invoice_path).values()))
+    timings['read_invoice_sheets'] = time.perf_counter() - start
+    profile = app_module.resolve_profile('KAISI', df.columns)
+    for _, _, stage in app_module.PIPELINE_STAGES:
+        start = time.perf_counter()
+        df = stage(df, profile)
+        timings[stage.__name__] = time.perf_counter() - start
+    start = time.perf_counter()
+    write_frame(df, output_path, 'xlsx', xlsx_engine=app_module.XLSX_ENGINE)
+    timings['write_output'] = time.perf_counter() - start
+    return timings
+
+
+def time_upload(app_module, client, invoice_path):
+    """Post an invoice to /upload and wait until its conversion is finished."""
+    start = time.perf_counter()
+    with open(invoice_path, 'rb') as f:
+        response = client.post('/upload', data={'vendor': 'KAISI', 'file': (f, os.path.basename(invoice_path))})
+    if not response.get_json().get('success'):
+        raise RuntimeError(f"Upload failed: {response.get_json()}")
+    app_module.conversion_queue.join()
+    return time.perf_counter() - start
+
+
+def run(rows_list, repeat, invoice_format):
+    workdir = tempfile.mkdtemp(prefix='invoice-bench-')
+    try:
+        app_module = load_app(workdir)
+        client = app_module.app.test_client()
+        # Warm up imports and first-call setup so they are not charged to the smallest invoice
+        warmup_path = write_invoice(generate_invoice(200, seed=1), os.path.join(workdir, f"warmup.{invoice_format}"))
+        time_stages(app_module, warmup_path, os.path.join(workdir, 'stages_output.xlsx'))
+        time_upload(app_module, client, warmup_path)
+        results = {}
+        for rows in rows_list:
+            invoice_path = write_invoice(generate_invoice(rows), os.path.join(workdir, f"kaisi_{rows}.{invoice_format}"))
+            runs = []
+            for _ in range(repeat):
+                reset_caches(app_module)
+                timings = time_stages(app_module, invoice_path, os.path.join(workdir, 'stages_output.xlsx'))
+                reset_caches(app_module)
+                timings['upload_end_to_end'] = time_upload(app_module, client, invoice_path)
+                runs.append(timings)
+            results[str(rows)] = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+            print(f"{rows} rows: " + ', '.join(f"{name} {seconds:.3f}s" for name, seconds in results[str(rows)].items()))
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(results, baseline, tolerance):
+    """Print each timing next to the baseline and return the regressions."""
+    regressions = []
+    for rows, timings in results.items():
+        for name, seconds in timings.items():
+            expected = baseline.get(rows, {}).get(name)
+            if expected is None:
+                continue
+            change = (seconds - expected) / expected if expected else 0
+            flag = ''
+            # Ignore noise on stages that take a few milliseconds
+            if change > tolerance and seconds - expected > 0.01:
+                flag = '  REGRESSION'
+                regressions.append((rows, name, expected, seconds))
+            print(f"{rows:>8} {name:<26} {expected:8.3f}s -> {seconds:8.3f}s ({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--format', choices=['xlsx', 'csv'], default='xlsx')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown against the baseline, as a fraction (default 0.25)')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help='write these results as the new baseline')
+    args = parser.parse_args()
+
+    results = run(args.rows, args.repeat, args.format)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r') as f:
+                baseline = json.load(f)
+        baseline.setdefault('results', {}).update(results)
+        baseline['machine'] = f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs, Python {platform.python_version()}"
+        baseline['format'] = args.format
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline.get('results', {}), args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} timings regressed by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Compare start-up time and requests per second of the ways the app can be served.
+
+    python benchmarks/server_benchmark.py                          # all modes, 16 clients for 10s
+    python benchmarks/server_benchmark.py --modes gunicorn --clients 32 --seconds 30
+
+Modes:
+    flask-debug  python submitButtonHandling.py with FLASK_DEBUG=1 (reloader and debugger,
+                 how the Docker image used to run the app)
+    flask        the Flask development server without debug
+    gunicorn     gunicorn -c gunicorn.conf.py submitButtonHandling:app (the Docker image today)
+
+Each server runs from a temporary copy of the project on a free local port. Start-up time is
+from launching the command until the first answered request; throughput is measured with
+--clients threads requesting --path on kept-alive connections for --seconds.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, BENCHMARK_DIR)
+
+from run_benchmarks import copy_project  # noqa: E402
+
+MODES = {
+    'flask-debug': ([sys.executable, 'submitButtonHandling.py'], {'FLASK_DEBUG': '1'}),
+    'flask': ([sys.executable, 'submitButtonHandling.py'], {'FLASK_DEBUG': '0'}),
+    'gunicorn': ([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'submitButtonHandling:app'], {}),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_serving(port, path, process, timeout):
+    """Return once the server answers path, or raise if it exits or takes longer than timeout."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', path)
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.02)
+        finally:
+            connection.close()
+    raise RuntimeError(f"server did not answer within {timeout}s")
+
+
+def load(port, path, clients, seconds):
+    """Request path from several threads for a while; return (requests answered, errors)."""
+    counts, errors = [0] * clients, [0] * clients
+    deadline = time.monotonic() + seconds
+
+    def client(index):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        while time.monotonic() < deadline:
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                if response.status == 200:
+                    counts[index] += 1
+                else:
+                    errors[index] += 1
+            except (OSError, http.client.HTTPException):
+                errors[index] += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts), sum(errors)
+
+
+def measure(mode, workdir, path, clients, seconds, startup_timeout):
+    command, extra_env = MODES[mode]
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), LOG_LEVEL='WARNING', TRANSLATION_RATE='0', **extra_env)
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        wait_until_serving(port, path, process, startup_timeout)
+        startup = time.perf_counter() - start
+        answered, errors = load(port, path, clients, seconds)
+    finally:
+        # The reloader and gunicorn run children; stop the whole process group
+        os.killpg(process.pid, 15)
+        process.wait(timeout=30)
+    return {'startup_seconds': startup, 'requests_per_second': answered / seconds, 'errors': errors}
+
+
+def run(modes, path, clients, seconds, startup_timeout):
+    workdir = tempfile.mkdtemp(prefix='invoice-server-')
+    try:
+        copy_project(workdir)
+        results = {}
+        for mode in modes:
+            results[mode] = result = measure(mode, workdir, path, clients, seconds, startup_timeout)
+            print(f"{mode:<12} start-up {result['startup_seconds']:6.2f}s  "
+                  f"{result['requests_per_second']:8.1f} req/s  {result['errors']} errors")
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--path', default='/metrics', help='request to time (default /metrics)')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent client threads (default 16)')
+    parser.add_argument('--seconds', type=float, default=10, help='how long to send requests (default 10)')
+    parser.add_argument('--startup-timeout', type=float, default=60)
+    parser.add_argument('--json', help='also save the results to this file')
+    args = parser.parse_args()
+
+    results = run(args.modes, args.path, args.clients, args.seconds, args.startup_timeout)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
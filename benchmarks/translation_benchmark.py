@@ -0,0 +1,94 @@
+"""
+Measure translation throughput through HttpTranslationBackend and AsyncTranslationClient
+against a local stub translator with configurable latency and failure rate.
+
+    python benchmarks/translation_benchmark.py                     # 1k descriptions, 50 ms per request
+    python benchmarks/translation_benchmark.py --latency 0.2 --failure-rate 0.1 --concurrency 1 8 16
+
+Every run translates the same unique descriptions into an empty cache, with the rate limit off,
+and reports the seconds taken, descriptions per second, requests sent, retries, and how many
+descriptions were passed through untranslated.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARK_DIR)
+
+sys.path.insert(0, BENCHMARK_DIR)
+sys.path.insert(0, PROJECT_DIR)
+
+from translation_stub import running_stub  # noqa: E402
+from translationCache import HttpTranslationBackend, TranslationCache, translate_unique  # noqa: E402
+from translationClient import AsyncTranslationClient, CircuitBreaker  # noqa: E402
+from pipelineMetrics import MetricsRegistry  # noqa: E402
+
+# Every failed attempt logs a warning; the summary line counts them instead
+logging.getLogger('translationClient').setLevel(logging.ERROR)
+
+
+def measure(workdir, descriptions, concurrency, batch_size, latency, failure_rate, retries):
+    registry = MetricsRegistry()
+    client = AsyncTranslationClient(concurrency=concurrency, rate=0, retries=retries, backoff=0.05,
+                                    breaker=CircuitBreaker(failure_threshold=1000), registry=registry)
+    cache = TranslationCache(os.path.join(workdir, f"translations_{concurrency}.db"))
+    with running_stub(latency, failure_rate) as server:
+        start = time.perf_counter()
+        _, passed_through = translate_unique(descriptions, cache, HttpTranslationBackend(server.url),
+                                             'en', 'zh-cn', batch_size=batch_size, client=client)
+        seconds = time.perf_counter() - start
+    counters = registry.drain()['counters']
+    return {
+        'seconds': seconds,
+        'descriptions_per_second': len(descriptions) / seconds,
+        'requests': server.requests,
+        'max_concurrent_requests': server.max_active,
+        'retries': counters.get(('translator_retries_total', ()), 0),
+        'passed_through': len(passed_through),
+    }
+
+
+def run(count, concurrency_list, batch_size, latency, failure_rate, retries):
+    descriptions = [f"Description {number}" for number in range(count)]
+    workdir = tempfile.mkdtemp(prefix='invoice-translation-')
+    try:
+        results = {}
+        for concurrency in concurrency_list:
+            results[concurrency] = result = measure(workdir, descriptions, concurrency, batch_size,
+                                                    latency, failure_rate, retries)
+            print(f"concurrency {concurrency:>3}: {result['seconds']:7.2f}s "
+                  f"{result['descriptions_per_second']:9.1f} descriptions/s  {result['requests']} requests "
+                  f"(at most {result['max_concurrent_requests']} at once), {result['retries']} retries, "
+                  f"{result['passed_through']} passed through")
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--descriptions', type=int, default=1000, help='unique descriptions (default 1000)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--batch-size', type=int, default=10, help='descriptions per request (default 10)')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per stub request (default 0.05)')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--retries', type=int, default=3)
+    parser.add_argument('--json', help='also save the results to this file')
+    args = parser.parse_args()
+
+    results = run(args.descriptions, args.concurrency, args.batch_size, args.latency, args.failure_rate, args.retries)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
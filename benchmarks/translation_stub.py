@@ -0,0 +1,104 @@
+"""
+A local translation service for HttpTranslationBackend, with configurable latency and failure rate.
+
+    python benchmarks/translation_stub.py --port 8099 --latency 0.05 --failure-rate 0.1
+    TRANSLATION_BACKEND_URL=http://127.0.0.1:8099/ python submitButtonHandling.py
+
+It answers POST {"texts", "src", "dest"} with {"translations": ["[dest] text", ...]}, and fails
+a request with a 503 at the given rate. The server counts requests, failures and the most
+requests it was serving at once, so tests and benchmarks can check the client against it.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubTranslationHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            failed = server.random.random() < server.failure_rate
+            if failed:
+                server.failures += 1
+        time.sleep(server.latency)
+        # Done before answering, so a client's next request never overlaps this one in the count
+        with server.lock:
+            server.active -= 1
+        if failed:
+            self.send_error(503, 'Stub translator failure')
+            return
+        body = json.dumps({'translations': [f"[{payload['dest']}] {text}" for text in payload['texts']]})
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body.encode('utf-8'))))
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubTranslationServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections beyond it and the client retries a second later
+    request_queue_size = 128
+
+    def __init__(self, address, latency=0.0, failure_rate=0.0, seed=0):
+        super().__init__(address, StubTranslationHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.active = 0
+        self.max_active = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+
+@contextmanager
+def running_stub(latency=0.0, failure_rate=0.0, seed=0):
+    """Serve a stub translator on a free local port for the duration of the with-block."""
+    server = StubTranslationServer(('127.0.0.1', 0), latency, failure_rate, seed)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds each request takes (default 0)')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='share of requests answered 503 (default 0)')
+    args = parser.parse_args()
+
+    server = StubTranslationServer(('127.0.0.1', args.port), args.latency, args.failure_rate)
+    print(f"Stub translator on {server.url} (latency {args.latency}s, failure rate {args.failure_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Compare write time and peak memory of the output writers (xlsxwriter, openpyxl, CSV, Parquet)
+on converted KAISI invoices of growing size.
+
+    python benchmarks/writer_benchmark.py                          # 10k and 100k rows
+    python benchmarks/writer_benchmark.py --rows 1000000 --writers xlsxwriter csv parquet
+
+Each writer runs in its own process, writing the invoice in chunks the way streaming
+conversions do, and reports the seconds taken and how far its peak resident set size rose
+above the process once the invoice was in memory.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, BENCHMARK_DIR)
+
+from generate_invoices import generate_invoice  # noqa: E402
+from memory_benchmark import max_rss_mb  # noqa: E402
+
+# writer name -> (output format, xlsx engine)
+WRITERS = {
+    'xlsxwriter': ('xlsx', 'xlsxwriter'),
+    'openpyxl': ('xlsx', 'openpyxl'),
+    'csv': ('csv', None),
+    'parquet': ('parquet', None),
+}
+
+
+def converted_invoice(rows):
+    """A generated invoice shaped like the pipeline's output."""
+    df = generate_invoice(rows)
+    df.columns = ['Barcode', 'Description', 'Qty', 'Price', 'SalesPrice1']
+    df['SinglePrice'] = (df['Price'] / df['Qty'].where(df['Qty'] > 0)).round(2)
+    df['Description2'] = '[zh-cn] ' + df['Description']
+    return df
+
+
+def measure(writer, rows, chunk_rows, output_path):
+    """Write one invoice with one writer in this process and print the result as JSON."""
+    from outputWriters import write_chunks
+    output_format, engine = WRITERS[writer]
+    df = converted_invoice(rows)
+    started = max_rss_mb()
+    start = time.perf_counter()
+    write_chunks((df.iloc[offset:offset + chunk_rows] for offset in range(0, len(df), chunk_rows)),
+                 output_path, output_format, xlsx_engine=engine)
+    seconds = time.perf_counter() - start
+    print(json.dumps({
+        'seconds': seconds,
+        'growth_mb': max_rss_mb() - started,
+        'size_mb': os.path.getsize(output_path) / 1024 / 1024,
+    }))
+
+
+def run(rows_list, writers, chunk_rows):
+    workdir = tempfile.mkdtemp(prefix='invoice-writers-')
+    try:
+        results = {}
+        for rows in rows_list:
+            for writer in writers:
+                output_path = os.path.join(workdir, f"{writer}_{rows}.{WRITERS[writer][0]}")
+                child = subprocess.run(
+                    [sys.executable, __file__, '--measure', writer, '--rows', str(rows),
+                     '--chunk-rows', str(chunk_rows), '--output', output_path],
+                    check=True, capture_output=True, text=True,
+                )
+                result = json.loads(child.stdout.strip().splitlines()[-1])
+                results.setdefault(str(rows), {})[writer] = result
+                os.remove(output_path)
+                print(f"{rows:>8} rows {writer:<11} {result['seconds']:8.3f}s "
+                      f"{result['growth_mb']:+8.1f} MB peak {result['size_mb']:8.1f} MB file")
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--writers', nargs='+', choices=list(WRITERS), default=list(WRITERS))
+    parser.add_argument('--chunk-rows', type=int, default=5000)
+    parser.add_argument('--json', help='also save the results to this file')
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.rows[0], args.chunk_rows, args.output)
+        return 0
+
+    results = run(args.rows, args.writers, args.chunk_rows)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import io
+import os
+import time
+import pstats
+import cProfile
+import logging
+import tracemalloc
+from datetime import datetime
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FOLDER = '.profiles'
+# How much the traced memory has to grow before another snapshot is taken
+SNAPSHOT_GROWTH = 1.1
+
+# tracemalloc is process-wide: it is started and its peak reset when the first profiler
+# begins, and stopped when the last one ends, so overlapping profiles never cut each other off
+_tracing_lock = Lock()
+_tracing_users = 0
+_started_tracing = False
+
+
+def _start_tracing():
+    """Join the profilers using tracemalloc; returns how many were already running."""
+    global _tracing_users, _started_tracing
+    with _tracing_lock:
+        if _tracing_users == 0:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _started_tracing = True
+            tracemalloc.reset_peak()
+        _tracing_users += 1
+        return _tracing_users - 1
+
+
+def _stop_tracing():
+    """Leave the profilers using tracemalloc; returns how many are still running."""
+    global _tracing_users, _started_tracing
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+        return _tracing_users
+
+
+def profile_paths(output_folder, upload_filename):
+    """Return (cProfile stats path, text report path) for an upload's conversion profile."""
+    folder = os.path.join(output_folder, PROFILE_FOLDER)
+    return os.path.join(folder, f"{upload_filename}.prof"), os.path.join(folder, f"{upload_filename}.txt")
+
+
+class ConversionProfiler:
+    """
+    Run a conversion under cProfile and tracemalloc and save the stats (for pstats or snakeviz)
+    plus a plain-text report. cProfile sees the thread that enters the profiler; time spent in
+    translator and sheet threads shows up as waiting in the functions that started them.
+    tracemalloc is process-wide, so conversions running at the same time are counted too;
+    the report says when another profiled conversion overlapped this one.
+    """
+
+    def __init__(self, stats_path, report_path, top=40):
+        self.stats_path = stats_path
+        self.report_path = report_path
+        self.top = top
+        self._profile = cProfile.Profile()
+        self._overlapped = False
+        self._stages = []
+        self._largest = None
+        self._largest_label = None
+        self._largest_size = 0
+
+    def __enter__(self):
+        self._overlapped = _start_tracing() > 0
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        self._profile.enable()
+        return self
+
+    def checkpoint(self, label):
+        """Record traced memory as a stage starts, keeping a snapshot of the largest point seen."""
+        if not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        self._stages.append((label, time.perf_counter() - self._wall_start, current, peak))
+        if current > self._largest_size * SNAPSHOT_GROWTH:
+            self._largest = tracemalloc.take_snapshot()
+            self._largest_label = label
+            self._largest_size = current
+
+    def __exit__(self, exc_type, exc, tb):
+        self._profile.disable()
+        wall = time.perf_counter() - self._wall_start
+        cpu = time.thread_time() - self._cpu_start
+        self.checkpoint('Finished')
+        _, peak = tracemalloc.get_traced_memory()
+        if _stop_tracing() > 0:
+            self._overlapped = True
+        try:
+            self._save(wall, cpu, peak, exc)
+        except Exception as e:
+            logger.error(f"Could not save conversion profile {self.report_path}: {str(e)}")
+        return False
+
+    def _save(self, wall, cpu, peak, exc):
+        os.makedirs(os.path.dirname(self.stats_path), exist_ok=True)
+        self._profile.dump_stats(self.stats_path)
+
+        report = io.StringIO()
+        report.write(f"Conversion profile, {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        report.write(f"Outcome: {'failed: ' + str(exc) if exc else 'completed'}\n")
+        report.write(f"Wall time: {wall:.3f}s, CPU time in the converting thread: {cpu:.3f}s\n")
+        report.write(f"Peak traced memory: {peak / 1024 / 1024:.1f} MB\n")
+        if self._overlapped:
+            report.write("Another profiled conversion ran at the same time; its allocations are in the memory figures.\n")
+        report.write("Function times cover the converting thread only; translator and sheet threads "
+                     "show up as waiting in their callers.\n\n")
+
+        report.write("Stages (seconds since start, traced memory, peak so far):\n")
+        for label, elapsed, current, stage_peak in self._stages:
+            report.write(f"  {elapsed:8.3f}s {current / 1024 / 1024:9.1f} MB {stage_peak / 1024 / 1024:9.1f} MB  {label}\n")
+
+        stats = pstats.Stats(self._profile, stream=report)
+        report.write("\nTop functions by cumulative time:\n")
+        stats.sort_stats('cumulative').print_stats(self.top)
+        report.write("\nTop functions by own time:\n")
+        stats.sort_stats('tottime').print_stats(self.top)
+
+        if self._largest is not None:
+            report.write(f"\nLargest allocations when traced memory was highest ({self._largest_label}):\n")
+            for stat in self._largest.statistics('lineno')[:self.top]:
+                report.write(f"  {stat}\n")
+
+        with open(self.report_path, 'w', encoding='utf-8') as f:
+            f.write(report.getvalue())
+        logger.info(f"Saved conversion profile to {self.report_path}")
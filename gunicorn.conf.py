@@ -0,0 +1,25 @@
+# Production server settings: gunicorn -c gunicorn.conf.py submitButtonHandling:app
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Import the app (pandas, numpy, openpyxl) once in the master, so forked workers start warm
+preload_app = True
+
+# With the default in-memory status store keep one worker process (set STATUS_BACKEND=sqlite
+# before raising it); threads serve concurrent requests and the progress event streams
+workers = int(os.environ.get('WEB_CONCURRENCY', '1'))
+worker_class = 'gthread'
+# Each /process-events stream holds a thread until its job finishes, and a worker admits up to
+# CONVERSION_QUEUE_SIZE + CONVERSION_WORKERS jobs; keep 8 more threads for everything else
+conversion_jobs = int(os.environ.get('CONVERSION_QUEUE_SIZE', '20')) + int(os.environ.get('CONVERSION_WORKERS', '2'))
+threads = int(os.environ.get('WEB_THREADS', str(conversion_jobs + 8)))
+
+# Large uploads are spooled and hashed inside the request
+timeout = int(os.environ.get('WEB_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+accesslog = '-'
+errorlog = '-'
@@ -0,0 +1,177 @@
+import logging
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_EXTENSIONS = {
+    'xlsx': '.xlsx',
+    'csv': '.csv',
+    'parquet': '.parquet',
+}
+# Number format for dates and datetimes in XLSX output; without one they show as serial numbers
+DATE_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+
+
+def _rows(df):
+    """Yield plain Python rows with missing values as None."""
+    df = df.astype(object)
+    yield from df.where(df.notna(), None).itertuples(index=False, name=None)
+
+
+class XlsxOutputWriter:
+    """Stream rows into an XLSX file with xlsxwriter's constant_memory mode, or openpyxl write-only."""
+
+    def __init__(self, path, engine=None):
+        self.path = path
+        self.columns = None
+        self._row = 0
+        if engine in (None, 'xlsxwriter'):
+            try:
+                import xlsxwriter
+                self._workbook = xlsxwriter.Workbook(path, {
+                    'constant_memory': True,
+                    'strings_to_numbers': False,
+                    'strings_to_formulas': False,
+                    'strings_to_urls': False,
+                    'default_date_format': DATE_FORMAT,
+                    'remove_timezone': True,
+                })
+                self._sheet = self._workbook.add_worksheet('Sheet1')
+                self.engine = 'xlsxwriter'
+                return
+            except ImportError:
+                if engine == 'xlsxwriter':
+                    raise
+                logger.info("xlsxwriter is not installed, writing XLSX with openpyxl")
+        from openpyxl import Workbook
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet('Sheet1')
+        self.engine = 'openpyxl'
+
+    def _append(self, values):
+        if self.engine == 'xlsxwriter':
+            self._sheet.write_row(self._row, 0, values)
+        else:
+            self._sheet.append([self._date_cell(value) if isinstance(value, date) else value for value in values])
+        self._row += 1
+
+    def _date_cell(self, value):
+        from openpyxl.cell import WriteOnlyCell
+        if getattr(value, 'tzinfo', None) is not None:
+            # Excel has no time zones
+            value = value.replace(tzinfo=None)
+        cell = WriteOnlyCell(self._sheet, value=value)
+        cell.number_format = DATE_FORMAT
+        return cell
+
+    def write(self, df):
+        """Append a chunk of rows; the first chunk decides the columns."""
+        if self.columns is None:
+            self.columns = list(df.columns)
+            self._append([str(column) for column in self.columns])
+        for row in _rows(df.reindex(columns=self.columns)):
+            self._append(row)
+
+    def close(self):
+        if self.engine == 'xlsxwriter':
+            self._workbook.close()
+        else:
+            self._workbook.save(self.path)
+
+
+class CsvOutputWriter:
+    """Append chunks to a UTF-8 CSV file (with a BOM so Excel keeps the Chinese text intact)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.columns = None
+
+    def write(self, df):
+        if self.columns is None:
+            self.columns = list(df.columns)
+            df.to_csv(self.path, index=False, encoding='utf-8-sig')
+        else:
+            df.reindex(columns=self.columns).to_csv(self.path, mode='a', index=False, header=False, encoding='utf-8')
+
+    def close(self):
+        pass
+
+
+class ParquetOutputWriter:
+    """Append chunks as row groups of a Parquet file; needs pyarrow."""
+
+    def __init__(self, path):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet output requires the pyarrow package")
+        self.path = path
+        self.columns = None
+        self._schema = None
+        self._writer = None
+
+    @staticmethod
+    def _widened(schema):
+        """
+        The file's schema is fixed by the first chunk, so make it fit any later one: integer
+        columns become float64 (a later chunk may hold 1.5 or a blank) and columns with no
+        values at all become strings.
+        """
+        import pyarrow as pa
+        fields = []
+        for field in schema:
+            if pa.types.is_integer(field.type):
+                field = field.with_type(pa.float64())
+            elif pa.types.is_null(field.type):
+                field = field.with_type(pa.string())
+            fields.append(field)
+        return pa.schema(fields, metadata=schema.metadata)
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if df.attrs:
+            # Pipeline bookkeeping in attrs does not belong in the file's metadata
+            df = df.copy(deep=False)
+            df.attrs = {}
+        if self._writer is None:
+            self.columns = list(df.columns)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self._schema = self._widened(table.schema)
+            table = table.cast(self._schema)
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+        else:
+            table = pa.Table.from_pandas(df.reindex(columns=self.columns), schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def open_output_writer(output_format, path, xlsx_engine=None):
+    """Return a writer for the requested output format."""
+    if output_format == 'xlsx':
+        return XlsxOutputWriter(path, engine=xlsx_engine)
+    if output_format == 'csv':
+        return CsvOutputWriter(path)
+    if output_format == 'parquet':
+        return ParquetOutputWriter(path)
+    raise ValueError(f"Unsupported output format: {output_format}")
+
+
+def write_chunks(chunks, path, output_format='xlsx', xlsx_engine=None):
+    """Write DataFrame chunks to path as they arrive, so only one chunk is in memory at a time."""
+    writer = open_output_writer(output_format, path, xlsx_engine=xlsx_engine)
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+    finally:
+        writer.close()
+    if writer.columns is None:
+        raise ValueError("No rows found in the uploaded file")
+
+
+def write_frame(df, path, output_format='xlsx', xlsx_engine=None):
+    """Write a whole DataFrame with the chosen writer."""
+    write_chunks([df], path, output_format, xlsx_engine=xlsx_engine)
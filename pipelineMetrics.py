@@ -0,0 +1,135 @@
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value):
+    """Escape a label value for the text format."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    """Render a sorted label tuple in Prometheus text format."""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+class MetricsRegistry:
+    """Counters, histograms and callback gauges exposed in the Prometheus text format."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = Lock()
+        self._metadata = {}
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+
+    def counter(self, name, help_text):
+        """Declare a counter."""
+        self._metadata[name] = ('counter', help_text)
+
+    def histogram(self, name, help_text):
+        """Declare a histogram."""
+        self._metadata[name] = ('histogram', help_text)
+
+    def gauge(self, name, help_text, callback):
+        """Declare a gauge whose value is read from callback() at scrape time."""
+        self._metadata[name] = ('gauge', help_text)
+        self._gauges[name] = callback
+
+    def inc(self, name, value=1, **labels):
+        """Add value to a counter."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Record one histogram observation."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    @contextmanager
+    def time(self, name, **labels):
+        """Observe how long the with-block took, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def drain(self):
+        """Return and reset the recorded values, so a worker process can hand them to the parent."""
+        with self._lock:
+            snapshot = {'counters': self._counters, 'histograms': self._histograms}
+            self._counters = {}
+            self._histograms = {}
+        return snapshot
+
+    def merge(self, snapshot):
+        """Add values drained from another process."""
+        with self._lock:
+            for key, value in snapshot['counters'].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            for key, (bucket_counts, total, count) in snapshot['histograms'].items():
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+                histogram[0] = [a + b for a, b in zip(histogram[0], bucket_counts)]
+                histogram[1] += total
+                histogram[2] += count
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(value[0]), value[1], value[2]) for key, value in self._histograms.items()}
+        for name, (metric_type, help_text) in sorted(self._metadata.items()):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            if metric_type == 'gauge':
+                lines.append(f'{name} {self._gauges[name]()}')
+            elif metric_type == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_format_labels(labels)} {value}')
+            else:
+                for (metric, labels), (bucket_counts, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(self.buckets, bucket_counts):
+                        lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {bucket_count}')
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {count}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+class InstrumentedTranslationBackend:
+    """Wrap a translation backend to count its calls and time them."""
+
+    def __init__(self, backend, registry):
+        self.backend = backend
+        self.registry = registry
+
+    def translate_batch(self, texts, src, dest):
+        self.registry.inc('translator_calls_total')
+        self.registry.inc('translator_texts_total', len(texts))
+        with self.registry.time('translator_call_duration_seconds'):
+            try:
+                return self.backend.translate_batch(texts, src, dest)
+            except Exception:
+                self.registry.inc('translator_errors_total')
+                raise
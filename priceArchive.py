@@ -0,0 +1,189 @@
+import os
+import re
+import uuid
+import logging
+
+import pandas as pd
+
+from sqliteStore import SQLiteStore
+from outputWriters import ParquetOutputWriter
+
+logger = logging.getLogger(__name__)
+
+PRICE_FIELDS = ('vendor', 'invoice_date', 'source_file', 'description', 'qty', 'price', 'single_price')
+
+
+def normalize_barcode(value):
+    """
+    Reduce a barcode to its digits, the same way when archiving and when querying:
+    6912345678902.0, '6912345-678902' and ' 6912345678902 ' all become '6912345678902'.
+    Returns None when nothing is left.
+    """
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    # A number that went through a float column: 6912345678902.0
+    text = re.sub(r'(?<=\d)\.0+$', '', text)
+    return re.sub(r'\D', '', text) or None
+
+
+class PriceArchive(SQLiteStore):
+    """
+    Every converted invoice row, kept as Parquet files partitioned by vendor and date,
+    with a SQLite index on barcode so price history queries never open the files.
+    """
+
+    SCHEMA = (
+        '''
+        CREATE TABLE IF NOT EXISTS prices (
+            barcode TEXT NOT NULL,
+            vendor TEXT NOT NULL,
+            invoice_date TEXT NOT NULL,
+            source_file TEXT NOT NULL,
+            description TEXT,
+            qty REAL,
+            price REAL,
+            single_price REAL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_prices_barcode_date ON prices (barcode, invoice_date)',
+        'CREATE INDEX IF NOT EXISTS idx_prices_source_file ON prices (source_file)',
+    )
+
+    def __init__(self, path, folder):
+        super().__init__(path)
+        self.folder = folder
+        self._parquet_available = None
+
+    def parquet_available(self):
+        """Parquet partitions need pyarrow; without it only the barcode index is kept."""
+        if self._parquet_available is None:
+            try:
+                import pyarrow  # noqa: F401
+                self._parquet_available = True
+            except ImportError:
+                logger.info("pyarrow is not installed, archiving prices to the index only")
+                self._parquet_available = False
+        return self._parquet_available
+
+    def partition_path(self, vendor, invoice_date, source_file):
+        """Return where the Parquet copy of a converted file lives."""
+        return os.path.join(
+            self.folder, f"vendor={vendor}", f"date={invoice_date}",
+            f"{os.path.splitext(source_file)[0]}.parquet"
+        )
+
+    def insert_rows(self, rows):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    'INSERT INTO prices (barcode, vendor, invoice_date, source_file, description, qty, price, single_price) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+
+    def publish(self, pending_name, source_file):
+        """Swap a finished file's pending rows in for whatever an earlier conversion archived."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('DELETE FROM prices WHERE source_file = ?', (source_file,))
+                connection.execute('UPDATE prices SET source_file = ? WHERE source_file = ?', (source_file, pending_name))
+
+    def discard(self, pending_name):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('DELETE FROM prices WHERE source_file = ?', (pending_name,))
+
+    def history(self, barcode, vendor=None, date_from=None, date_to=None, limit=1000):
+        """Return the archived rows for a barcode, newest invoice first."""
+        conditions = ['barcode = ?']
+        params = [normalize_barcode(barcode)]
+        if vendor:
+            conditions.append('vendor = ?')
+            params.append(vendor)
+        if date_from:
+            conditions.append('invoice_date >= ?')
+            params.append(date_from)
+        if date_to:
+            conditions.append('invoice_date <= ?')
+            params.append(date_to)
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {', '.join(PRICE_FIELDS)} FROM prices WHERE {' AND '.join(conditions)} "
+                f"ORDER BY invoice_date DESC, rowid DESC LIMIT ?",
+                [*params, limit]
+            ).fetchall()
+        return [dict(zip(PRICE_FIELDS, row)) for row in rows]
+
+
+class ArchiveWriter:
+    """
+    Append a conversion's chunks to the archive as they are produced. Rows stay pending
+    until close(), so a failed conversion leaves the archive as it was.
+    """
+
+    def __init__(self, archive, vendor, invoice_date, source_file):
+        self.archive = archive
+        self.vendor = vendor
+        self.invoice_date = invoice_date
+        self.source_file = source_file
+        self._pending_name = f".pending/{uuid.uuid4().hex}"
+        self._parquet_path = None
+        self._parquet = None
+        if archive.parquet_available():
+            self._parquet_path = archive.partition_path(vendor, invoice_date, source_file)
+            self._temp_path = f"{self._parquet_path}.{uuid.uuid4().hex}.part"
+            os.makedirs(os.path.dirname(self._parquet_path), exist_ok=True)
+            self._parquet = ParquetOutputWriter(self._temp_path)
+
+    @staticmethod
+    def _numbers(values):
+        values = pd.to_numeric(values, errors='coerce')
+        return [None if pd.isna(value) else float(value) for value in values]
+
+    def write(self, df):
+        if self._parquet is not None:
+            # Every chunk has to match the first one's schema: text columns mix numbers and strings
+            # across invoices, so store them as strings, and numbers as float64, since a later
+            # chunk may hold a fraction (1.5 cartons) where the first chunk's column was whole
+            archived = df.copy()
+            for column in archived.columns:
+                if archived[column].dtype == object:
+                    archived[column] = archived[column].where(archived[column].isna(), archived[column].astype(str))
+                elif archived[column].dtype.kind in 'iuf':
+                    archived[column] = archived[column].astype('float64')
+            self._parquet.write(archived)
+        if 'Barcode' not in df.columns:
+            return
+        barcodes = [normalize_barcode(value) for value in df['Barcode']]
+        rows = zip(
+            barcodes,
+            df['Description'].astype(str) if 'Description' in df.columns else [None] * len(df),
+            self._numbers(df['Qty']) if 'Qty' in df.columns else [None] * len(df),
+            self._numbers(df['Price']) if 'Price' in df.columns else [None] * len(df),
+            self._numbers(df['SinglePrice']) if 'SinglePrice' in df.columns else [None] * len(df),
+        )
+        self.archive.insert_rows([
+            (barcode, self.vendor, self.invoice_date, self._pending_name, description, qty, price, single_price)
+            for barcode, description, qty, price, single_price in rows
+            if barcode
+        ])
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+            if os.path.exists(self._temp_path):
+                os.replace(self._temp_path, self._parquet_path)
+        self.archive.publish(self._pending_name, self.source_file)
+
+    def discard(self):
+        if self._parquet is not None:
+            self._parquet.close()
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+        self.archive.discard(self._pending_name)
@@ -0,0 +1,94 @@
+import os
+import uuid
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_FOLDER = '.fingerprints'
+# DataFrame.attrs key listing descriptions the translator passed through untranslated
+UNTRANSLATED_ATTR = 'untranslated'
+
+
+def fingerprint_path(output_path):
+    """Return where the row fingerprints for a converted file are kept."""
+    folder, name = os.path.split(output_path)
+    return os.path.join(folder, FINGERPRINT_FOLDER, f"{name}.jsonl")
+
+
+def fingerprint(text):
+    """Short, stable fingerprint of one cleaned description."""
+    return hashlib.blake2b(str(text).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def load_previous_translations(output_path):
+    """Read the fingerprints stored with an earlier conversion as {fingerprint: Description2}."""
+    path = fingerprint_path(output_path)
+    if not os.path.exists(path):
+        return {}
+    translations = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            row_fingerprint, translated = json.loads(line)
+            if translated is not None:
+                translations[row_fingerprint] = translated
+    logger.info(f"Loaded {len(translations)} earlier translations for {output_path}")
+    return translations
+
+
+class FingerprintWriter:
+    """Write one (fingerprint, Description2) line per output row, replacing the old file on close."""
+
+    def __init__(self, output_path):
+        self.path = fingerprint_path(output_path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Unique per writer, so two conversions of the same output never share a temp file
+        self._temp_path = f"{self.path}.{uuid.uuid4().hex}.part"
+        self._file = open(self._temp_path, 'w', encoding='utf-8')
+
+    def write(self, df):
+        # Passed-through text is stored as None, so a reprocess asks the translator again
+        untranslated = df.attrs.get(UNTRANSLATED_ATTR, ())
+        for text, translated in zip(df['Description'], df['Description2']):
+            if not isinstance(translated, str) or text in untranslated:
+                translated = None
+            self._file.write(json.dumps([fingerprint(text), translated], ensure_ascii=False) + '\n')
+
+    def close(self):
+        self._file.close()
+        os.replace(self._temp_path, self.path)
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+
+class PreviousTranslationCache:
+    """
+    Translation cache that answers from an earlier conversion's rows first,
+    so only descriptions whose cleaned text changed reach the real cache and translator.
+    """
+
+    def __init__(self, previous, cache):
+        self.previous = previous
+        self.cache = cache
+        self.reused = 0
+
+    def get_many(self, texts, src, dest):
+        found = {}
+        remaining = []
+        for text in texts:
+            translated = self.previous.get(fingerprint(text))
+            if translated is None:
+                remaining.append(text)
+            else:
+                found[text] = translated
+        self.reused += len(found)
+        if remaining:
+            found.update(self.cache.get_many(remaining, src, dest))
+        return found
+
+    def put_many(self, translations, src, dest):
+        self.cache.put_many(translations, src, dest)
@@ -0,0 +1,34 @@
+import os
+import sqlite3
+from threading import Lock
+
+
+class SQLiteStore:
+    """Base class for the SQLite-backed stores; opens one WAL connection per process."""
+
+    # Statements run once when the database is opened
+    SCHEMA = ()
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = Lock()
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        """Open the database once per process, so forked workers never share a handle."""
+        if self._connection is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+            self._connection = connection
+            self._pid = os.getpid()
+            self._on_open(connection)
+        return self._connection
+
+    def _on_open(self, connection):
+        """Hook for subclasses to run one-off work after the schema is created."""
@@ -6,6 +6,8 @@ document.addEventListener("DOMContentLoaded", function() {
     const uploadForm = document.getElementById('uploadForm');
     const fileInput = document.getElementById('fileInput');
     const vendorInput = document.getElementById('vendorInput');
+    const formatInput = document.getElementById('formatInput');
+    const sheetsInput = document.getElementById('sheetsInput');
     const fileList = document.getElementById('fileList');
     const fileList1 = document.getElementById('fileList1');
     const downloadButton = document.getElementById('downloadButton');
@@ -123,17 +125,109 @@ document.addEventListener("DOMContentLoaded", function() {
         statusElement.textContent = 'Initializing...';
     }
 
+    // Apply a status update from the server; returns true once processing has finished
+    function handleProcessStatus(data) {
+        console.log('Process status:', data);
+
+        if (data.status === 'Error') {
+            throw new Error(data.error || 'Processing failed');
+        } else if (data.status === 'Completed!' || data.progress >= 1.0) {
+            updateProgress(100, 'Processing completed!');
+            
+            // Update the success message immediately
+            const fileList = document.getElementById('fileList');
+            const fileList1 = document.getElementById('fileList1');
+            
+            console.log('Setting success message');
+            fileList.innerHTML = '<span style="color: #10B981; font-weight: bold;">✓ File converted successfully!</span>';
+            fileList1.innerHTML = '<span style="color: #10B981; font-weight: bold;">✓ 文件已成功转换！</span>';
+            
+            // Show the download button if URL is available
+            if (data.downloadUrl) {
+                console.log('Download URL received:', data.downloadUrl);
+                const downloadButton = document.getElementById('downloadButton');
+                if (downloadButton) {
+                    console.log('Download button found, making visible');
+                    downloadButton.style.display = 'inline-block';
+                    downloadButton.onclick = function() {
+                        console.log('Download button clicked, navigating to:', data.downloadUrl);
+                        window.location.href = data.downloadUrl;
+                    };
+                } else {
+                    console.error('Download button not found in DOM');
+                }
+            } else {
+                console.error('No download URL received from server');
+            }
+            return true;
+        }
+        
+        // Update progress based on actual progress
+        const processPercentage = Math.round((data.progress || 0) * 100);
+        updateProgress(processPercentage, data.status || 'Processing...');
+        return false;
+    }
+
+    // Follow progress over Server-Sent Events, pushed by the server as stages change
+    function watchProcessEvents(jobId, vendor, filename) {
+        return new Promise((resolve, reject) => {
+            const source = new EventSource(`/process-events/${jobId}`);
+            source.onmessage = function(event) {
+                try {
+                    if (handleProcessStatus(JSON.parse(event.data))) {
+                        source.close();
+                        resolve();
+                    }
+                } catch (error) {
+                    source.close();
+                    reject(error);
+                }
+            };
+            source.onerror = function() {
+                // The stream dropped (proxy timeout, worker restart): carry on by polling
+                source.close();
+                pollProcessStatus(vendor, filename, jobId).then(resolve, reject);
+            };
+        });
+    }
+
+    // Fallback for browsers without EventSource, or when the stream drops: poll the status endpoint
+    function pollProcessStatus(vendor, filename, jobId) {
+        const query = jobId ? `?job=${encodeURIComponent(jobId)}` : '';
+        return new Promise((resolve, reject) => {
+            const processingInterval = setInterval(async () => {
+                try {
+                    const response = await fetch(`/process-status/${vendor}/${encodeURIComponent(filename)}${query}`);
+                    if (!response.ok) {
+                        throw new Error('Network response was not ok');
+                    }
+                    if (handleProcessStatus(await response.json())) {
+                        clearInterval(processingInterval);
+                        resolve();
+                    }
+                } catch (error) {
+                    clearInterval(processingInterval);
+                    reject(error);
+                }
+            }, 1000);
+        });
+    }
+
     // Update the uploadAndPrepareDownload function
     async function uploadAndPrepareDownload(file, vendor) {
         try {
             resetProgress();
             updateProgress(0, 'Starting upload...');
-            let processingInterval = null;
-            let isCompleted = false;
 
             const formData = new FormData();
             formData.append('file', file);
             formData.append('vendor', vendor);
+            if (formatInput) {
+                formData.append('format', formatInput.value);
+            }
+            if (sheetsInput) {
+                formData.append('sheets', sheetsInput.value);
+            }
 
             // Create custom XMLHttpRequest to track upload progress
             const xhr = new XMLHttpRequest();
@@ -150,6 +244,12 @@ document.addEventListener("DOMContentLoaded", function() {
                     if (xhr.status === 200) {
                         const response = JSON.parse(xhr.responseText);
                         resolve(response);
+                    } else if (xhr.status === 413) {
+                        const response = JSON.parse(xhr.responseText);
+                        reject(new Error(response.message || 'File is too large'));
+                    } else if (xhr.status === 429) {
+                        const response = JSON.parse(xhr.responseText);
+                        reject(new Error(response.message || 'Server is busy, please try again shortly'));
                     } else {
                         reject(new Error('Upload failed'));
                     }
@@ -163,78 +263,22 @@ document.addEventListener("DOMContentLoaded", function() {
             xhr.open('POST', '/upload', true);
             xhr.send(formData);
 
-            // Start processing status updates
-            processingInterval = setInterval(async () => {
-                if (isCompleted) {
-                    clearInterval(processingInterval);
-                    return;
-                }
-
-                try {
-                    const response = await fetch(`/process-status/${vendor}/${encodeURIComponent(file.name)}`);
-                    if (!response.ok) {
-                        throw new Error('Network response was not ok');
-                    }
-                    const data = await response.json();
-                    
-                    console.log('Process status:', data); 
-                    
-                    if (data.status === 'Completed!' || data.progress >= 1.0) {
-                        isCompleted = true;
-                        clearInterval(processingInterval);
-                        updateProgress(100, 'Processing completed!');
-                        
-                        // Update the success message immediately
-                        const fileList = document.getElementById('fileList');
-                        const fileList1 = document.getElementById('fileList1');
-                        
-                        console.log('Setting success message');
-                        fileList.innerHTML = '<span style="color: #10B981; font-weight: bold;">✓ File converted successfully!</span>';
-                        fileList1.innerHTML = '<span style="color: #10B981; font-weight: bold;">✓ 文件已成功转换！</span>';
-                        
-                        // Show the download button if URL is available
-                        if (data.downloadUrl) {
-                            console.log('Download URL received:', data.downloadUrl);
-                            const downloadButton = document.getElementById('downloadButton');
-                            if (downloadButton) {
-                                console.log('Download button found, making visible');
-                                downloadButton.style.display = 'inline-block';
-                                downloadButton.onclick = function() {
-                                    console.log('Download button clicked, navigating to:', data.downloadUrl);
-                                    window.location.href = data.downloadUrl;
-                                };
-                            } else {
-                                console.error('Download button not found in DOM');
-                            }
-                        } else {
-                            console.error('No download URL received from server');
-                        }
-                        return;
-                    } else if (data.status === 'Error') {
-                        isCompleted = true;
-                        clearInterval(processingInterval);
-                        throw new Error(data.error || 'Processing failed');
-                    }
-                    
-                    // Update progress based on actual progress
-                    const processPercentage = Math.round((data.progress || 0) * 100);
-                    updateProgress(processPercentage, data.status || 'Processing...');
-                    
-                } catch (error) {
-                    console.error('Error checking process status:', error);
-                    isCompleted = true;
-                    clearInterval(processingInterval);
-                    updateProgress(0, 'Error: ' + error.message);
-                }
-            }, 1000);
-
             const result = await promise;
             if (!result.success) {
-                isCompleted = true;
-                clearInterval(processingInterval);
                 throw new Error(result.message || 'Upload failed');
             }
 
+            try {
+                if (result.jobId && window.EventSource) {
+                    await watchProcessEvents(result.jobId, vendor, file.name);
+                } else {
+                    await pollProcessStatus(vendor, file.name, result.jobId);
+                }
+            } catch (error) {
+                console.error('Error checking process status:', error);
+                updateProgress(0, 'Error: ' + error.message);
+            }
+
             return true;
         } catch (error) {
             console.error('Upload error:', error);
@@ -23,6 +23,17 @@ document.addEventListener('DOMContentLoaded', () => {
                 </td>
             `;
 
+            // Conversions run under the profiler link their report and cProfile stats
+            if (log.profile) {
+                const profileLinks = document.createElement('div');
+                profileLinks.className = 'text-sm text-gray-500';
+                profileLinks.innerHTML = `
+                    <a href="${log.profile.report}" target="_blank" class="underline">Profile report</a>
+                    · <a href="${log.profile.stats}" class="underline">cProfile stats</a>
+                `;
+                row.children[1].appendChild(profileLinks);
+            }
+
             if (log.status.toLowerCase() === 'processing') {
                 row.innerHTML += `
                     <td class="px-6 py-4">
@@ -60,21 +71,62 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     };
 
+    // Entries shown so far, by id. Polls refresh only the newest page; older pages are
+    // fetched when "Load more" is clicked, so a poll costs the same however long the history is
+    const shownLogs = new Map();
+    let olderCursor = null;
+    const loadMoreButton = document.getElementById('load-more-button');
+
+    const fetchHistoryPage = async (filters = {}, cursor = null) => {
+        const params = new URLSearchParams(filters);
+        if (cursor !== null) {
+            params.set('cursor', cursor);
+        }
+        const response = await fetch(`/upload-history?${params}`);
+        const data = await response.json();
+        if (!data.success || !data.logs) {
+            throw new Error(data.message || 'Failed to fetch upload history');
+        }
+        return data;
+    };
+
+    const showLogs = (logs) => {
+        logs.forEach(log => shownLogs.set(log.id, log));
+        renderLogs([...shownLogs.values()].sort((a, b) => b.id - a.id));
+        loadMoreButton.style.display = olderCursor === null ? 'none' : 'inline-block';
+    };
+
     // Function to fetch and update the upload history
     const updateUploadHistory = async () => {
         try {
-            const response = await fetch('/upload-history');
-            const data = await response.json();
-            if (data.success && data.logs) {
-                renderLogs(data.logs);
-            } else {
-                console.error(data.message || 'Failed to fetch upload history');
+            const data = await fetchHistoryPage();
+            if (shownLogs.size === 0) {
+                olderCursor = data.nextCursor ?? null;
             }
+            showLogs(data.logs);
         } catch (error) {
             console.error('Error fetching upload history:', error);
         }
     };
 
+    // Append the next older page of the history
+    const loadOlderHistory = async () => {
+        if (olderCursor === null) {
+            return;
+        }
+        loadMoreButton.disabled = true;
+        try {
+            const data = await fetchHistoryPage({}, olderCursor);
+            olderCursor = data.nextCursor ?? null;
+            showLogs(data.logs);
+        } catch (error) {
+            console.error('Error fetching older upload history:', error);
+        } finally {
+            loadMoreButton.disabled = false;
+        }
+    };
+    loadMoreButton.addEventListener('click', loadOlderHistory);
+
     // Function to handle download actions
     async function handleDownload(vendor, filename, downloadUrl) {
         try {
@@ -106,14 +158,7 @@ document.addEventListener('DOMContentLoaded', () => {
     // Function to load completed files and add download buttons
     async function loadCompletedFiles() {
     try {
-        const response = await fetch('/upload-history');
-        const data = await response.json();
-
-        if (!data.success) {
-            console.error('Failed to fetch upload history:', data.message);
-            return;
-        }
-
+        const data = await fetchHistoryPage({ status: 'completed' });
         const completedFiles = data.logs.filter((log) => log.status === 'completed');
         const tbody = document.getElementById('completed-files');
         tbody.innerHTML = '';
@@ -0,0 +1,158 @@
+import json
+import time
+from collections import OrderedDict
+from threading import Condition, Lock
+
+from sqliteStore import SQLiteStore
+
+
+class MemoryStatusStore:
+    """
+    Processing status kept in this process, evicted after ttl seconds without an update
+    and capped at max_entries (oldest updates go first).
+    """
+
+    def __init__(self, ttl=3600, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._changed = Condition(Lock())
+        # status key -> (status dict, version, updated_at), oldest update first
+        self._statuses = OrderedDict()
+        self._version = 0
+
+    def _evict(self, now):
+        while self._statuses:
+            oldest = next(iter(self._statuses.values()))
+            if len(self._statuses) <= self.max_entries and now - oldest[2] < self.ttl:
+                break
+            self._statuses.popitem(last=False)
+
+    def set(self, key, status):
+        """Replace the status for key and wake anyone waiting on it."""
+        now = time.time()
+        with self._changed:
+            self._version += 1
+            self._statuses[key] = (dict(status), self._version, now)
+            self._statuses.move_to_end(key)
+            self._evict(now)
+            self._changed.notify_all()
+
+    def _current(self, key, now):
+        entry = self._statuses.get(key)
+        if entry is None or now - entry[2] >= self.ttl:
+            return None, None
+        return dict(entry[0]), entry[1]
+
+    def get(self, key):
+        """Return the status for key, or None if there is none or it has expired."""
+        with self._changed:
+            return self._current(key, time.time())[0]
+
+    def wait_for_change(self, key, last_version, timeout):
+        """
+        Block until the status for key has a version other than last_version, or timeout.
+        Returns (status, version); status is None if there is none.
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                status, version = self._current(key, time.time())
+                remaining = deadline - time.monotonic()
+                if version != last_version or remaining <= 0:
+                    return status, version
+                self._changed.wait(remaining)
+
+
+class SQLiteStatusStore(SQLiteStore):
+    """
+    Processing status shared by every worker process through one SQLite file.
+    Waiters in this process are woken at once; changes made by other workers are seen by polling.
+    """
+
+    SCHEMA = (
+        '''
+        CREATE TABLE IF NOT EXISTS statuses (
+            key TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_statuses_updated_at ON statuses (updated_at)',
+    )
+
+    # Seconds between eviction sweeps and between polls for other workers' updates
+    EVICT_INTERVAL = 5
+    POLL_INTERVAL = 0.25
+
+    def __init__(self, path, ttl=3600, max_entries=10000):
+        super().__init__(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._changed = Condition(Lock())
+        self._last_evicted = 0
+
+    def _evict(self, connection, now):
+        if now - self._last_evicted < self.EVICT_INTERVAL:
+            return
+        self._last_evicted = now
+        connection.execute('DELETE FROM statuses WHERE updated_at < ?', (now - self.ttl,))
+        connection.execute(
+            'DELETE FROM statuses WHERE rowid IN '
+            '(SELECT rowid FROM statuses ORDER BY updated_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+
+    def set(self, key, status):
+        """Replace the status for key and wake anyone waiting on it."""
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                # Versions grow with the clock, so a key that was evicted and set again still looks changed
+                connection.execute(
+                    'INSERT INTO statuses (key, payload, version, updated_at) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (key) DO UPDATE SET payload = excluded.payload, '
+                    'version = MAX(version + 1, excluded.version), updated_at = excluded.updated_at',
+                    (key, json.dumps(status), time.time_ns(), now)
+                )
+                self._evict(connection, now)
+        with self._changed:
+            self._changed.notify_all()
+
+    def _current(self, key):
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT payload, version FROM statuses WHERE key = ? AND updated_at >= ?',
+                (key, time.time() - self.ttl)
+            ).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    def get(self, key):
+        """Return the status for key, or None if there is none or it has expired."""
+        return self._current(key)[0]
+
+    def wait_for_change(self, key, last_version, timeout):
+        """
+        Block until the status for key has a version other than last_version, or timeout.
+        Returns (status, version); status is None if there is none.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            status, version = self._current(key)
+            remaining = deadline - time.monotonic()
+            if version != last_version or remaining <= 0:
+                return status, version
+            with self._changed:
+                self._changed.wait(min(remaining, self.POLL_INTERVAL))
+
+
+def open_status_store(backend, path, ttl=3600, max_entries=10000):
+    """Build the status store named by backend: 'memory' or 'sqlite'."""
+    if backend == 'memory':
+        return MemoryStatusStore(ttl=ttl, max_entries=max_entries)
+    if backend == 'sqlite':
+        return SQLiteStatusStore(path, ttl=ttl, max_entries=max_entries)
+    raise ValueError(f"Unknown status backend: {backend}")
@@ -1,63 +1,359 @@
 import os
+import numpy as np
 import pandas as pd
+from openpyxl import load_workbook
 import re
-from flask import Flask, request, jsonify, send_from_directory
+import tempfile
+from flask import Flask, Request, request, jsonify, send_from_directory, Response, stream_with_context
 from werkzeug.utils import secure_filename
-from googletrans import Translator
+from werkzeug.exceptions import RequestEntityTooLarge
 from flask_cors import CORS
 import logging
 import json
-from datetime import datetime
-from threading import Lock
 import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+import hashlib
+import shutil
+from threading import Lock, Thread
+import queue
+import uuid
+import zipfile
+import multiprocessing
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from translationCache import TranslationCache, GoogleTranslateBackend, HttpTranslationBackend, translate_unique
+from translationClient import AsyncTranslationClient, CircuitBreaker
+from uploadHistory import UploadHistoryStore
+from pipelineMetrics import MetricsRegistry, InstrumentedTranslationBackend
+from outputWriters import OUTPUT_EXTENSIONS, open_output_writer, write_chunks
+from vendorProfiles import DEFAULT_PROFILE, TEXT_COLUMNS, header_names, resolve_profile
+from statusStore import open_status_store
+from priceArchive import PriceArchive, ArchiveWriter, normalize_barcode
+from conversionProfiler import ConversionProfiler, profile_paths
+from rowFingerprints import (
+    UNTRANSLATED_ATTR, FingerprintWriter, PreviousTranslationCache, fingerprint_path, load_previous_translations
+)
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
-app = Flask(__name__, static_folder='static')
-CORS(app)
+# Set up logging; LOG_LEVEL=DEBUG brings back the per-request diagnostics
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+logging.basicConfig(level=LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
 # Define folders
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
+OBJECT_STORE_FOLDER = os.path.join(UPLOAD_FOLDER, '.objects')
 PROCESSED_FOLDER = os.path.join(BASE_DIR, "processed")
 DESKTOP_DOWNLOADS = os.path.join(os.path.expanduser("~/Downloads"))
 UPLOAD_LOG_FILE = os.path.join(BASE_DIR, 'upload_log.json')
+UPLOAD_HISTORY_DB = os.path.join(BASE_DIR, 'upload_history.db')
+TRANSLATION_CACHE_FILE = os.path.join(BASE_DIR, 'translation_cache.db')
+STATUS_DB = os.path.join(BASE_DIR, 'processing_status.db')
+PRICE_ARCHIVE_FOLDER = os.path.join(BASE_DIR, 'archive')
+PRICE_INDEX_DB = os.path.join(BASE_DIR, 'price_index.db')
+
+# Largest request accepted; bigger uploads get a 413
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', str(200 * 1024 * 1024)))
+# Also copy each downloaded file into ~/Downloads (only useful when the server runs on the user's machine)
+COPY_DOWNLOADS_TO_DESKTOP = os.environ.get('COPY_DOWNLOADS_TO_DESKTOP', '').lower() in ('1', 'true', 'yes')
+# Seconds browsers may cache a converted file before revalidating it with its ETag
+DOWNLOAD_MAX_AGE = int(os.environ.get('DOWNLOAD_MAX_AGE', '0'))
+# Let a fronting web server (Apache mod_xsendfile, nginx) send the file bytes
+USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+# Let /upload and /reprocess run a conversion under the profiler when asked with X-Profile or profile=1
+ALLOW_PROFILING = os.environ.get('ALLOW_PROFILING', '1').lower() not in ('0', 'false', 'no')
 
 # Ensure directories exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(PROCESSED_FOLDER, exist_ok=True)
-os.makedirs(DESKTOP_DOWNLOADS, exist_ok=True)
+if COPY_DOWNLOADS_TO_DESKTOP:
+    os.makedirs(DESKTOP_DOWNLOADS, exist_ok=True)
+
+class HashingSpoolFile:
+    """
+    Temporary file in the object store that hashes uploaded bytes as werkzeug writes them,
+    so save_upload can link it into place without reading the upload a second time.
+    """
 
-# Add these after your other global variables
-processing_status = {}
-status_lock = Lock()
+    def __init__(self):
+        os.makedirs(OBJECT_STORE_FOLDER, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=OBJECT_STORE_FOLDER, prefix='.', suffix='.part')
+        self.name = self._file.name
+        self.digest = hashlib.sha256()
+        self._hashed = 0
+        self.hash_valid = True
 
-def read_excel_file(file_path):
-    """Read data from Excel or CSV file."""
-    try:
-        file_extension = os.path.splitext(file_path)[1].lower()
-        app.logger.info(f"Reading file: {file_path} with extension: {file_extension}")
-        
-        if file_extension == '.csv':
-            return pd.read_csv(file_path)
-        elif file_extension == '.xlsx':
-            return pd.read_excel(file_path, engine='openpyxl')
-        elif file_extension == '.xls':
-            return pd.read_excel(file_path, engine='xlrd')
+    def write(self, data):
+        # Only a plain sequential write keeps the running hash in step with the contents
+        if self._file.tell() != self._hashed:
+            self.hash_valid = False
+        self.digest.update(data)
+        self._hashed += len(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+class HashingRequest(Request):
+    """Request that spools uploaded files straight into the object store, hashing them on the way in."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpoolFile()
+
+app = Flask(__name__, static_folder='static')
+app.request_class = HashingRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+app.config['USE_X_SENDFILE'] = USE_X_SENDFILE
+CORS(app)
+
+# Processing status: 'memory' for a single worker process, 'sqlite' to share it between workers
+STATUS_BACKEND = os.environ.get('STATUS_BACKEND', 'memory')
+STATUS_TTL_SECONDS = int(os.environ.get('STATUS_TTL_SECONDS', '3600'))
+STATUS_MAX_ENTRIES = int(os.environ.get('STATUS_MAX_ENTRIES', '10000'))
+processing_status = open_status_store(
+    STATUS_BACKEND, STATUS_DB, ttl=STATUS_TTL_SECONDS, max_entries=STATUS_MAX_ENTRIES
+)
+SSE_KEEPALIVE_SECONDS = 15
+
+# Upload history, migrated once from the legacy upload_log.json
+upload_history = UploadHistoryStore(UPLOAD_HISTORY_DB, legacy_json_path=UPLOAD_LOG_FILE)
+
+# Bump whenever a conversion stage changes its output, so cached conversions are redone
+PIPELINE_VERSION = '2'
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# Output written for the Enrich POS import: xlsx, csv or parquet
+OUTPUT_FORMAT = os.environ.get('OUTPUT_FORMAT', 'xlsx')
+# xlsxwriter (constant memory) or openpyxl (write-only); unset picks xlsxwriter when installed
+XLSX_ENGINE = os.environ.get('XLSX_ENGINE') or None
+
+# Batch uploads are converted in separate processes, since cleaning and XLSX writing hold the GIL
+BATCH_PROCESSES = int(os.environ.get('BATCH_PROCESSES', str(os.cpu_count() or 1)))
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', '100'))
+# Batches are forgotten, with their download archive, once not updated for this long or beyond the cap
+BATCH_TTL_SECONDS = int(os.environ.get('BATCH_TTL_SECONDS', '3600'))
+BATCH_MAX_JOBS = int(os.environ.get('BATCH_MAX_JOBS', '1000'))
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+# Workbooks with an invoice per sheet: one combined output, or a zip holding a file per sheet
+SHEETS_MODE = os.environ.get('SHEETS_MODE', 'combined')
+SHEETS_MODES = ('combined', 'separate')
+# Sheets of one workbook converted at the same time
+SHEET_WORKERS = int(os.environ.get('SHEET_WORKERS', '4'))
+batch_pool = None
+# batch id -> batch, least recently updated first
+batch_jobs = OrderedDict()
+batch_lock = Lock()
+
+# Every converted row is also archived by vendor/date and indexed by barcode for /prices
+PRICE_ARCHIVE_ENABLED = os.environ.get('PRICE_ARCHIVE', '1').lower() not in ('0', 'false', 'no')
+PRICE_HISTORY_MAX_ROWS = 5000
+price_archive = PriceArchive(PRICE_INDEX_DB, PRICE_ARCHIVE_FOLDER)
+
+HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', '200'))
+HISTORY_MAX_PAGE_SIZE = 1000
+
+# Conversion job queue settings
+CONVERSION_WORKERS = int(os.environ.get('CONVERSION_WORKERS', '2'))
+CONVERSION_QUEUE_SIZE = int(os.environ.get('CONVERSION_QUEUE_SIZE', '20'))
+conversion_queue = queue.Queue(maxsize=CONVERSION_QUEUE_SIZE)
+conversion_workers = []
+workers_lock = Lock()
+
+# Translation cache settings
+TRANSLATION_CACHE_SIZE = int(os.environ.get('TRANSLATION_CACHE_SIZE', '100000'))
+TRANSLATION_BATCH_SIZE = int(os.environ.get('TRANSLATION_BATCH_SIZE', '50'))
+translation_cache = TranslationCache(TRANSLATION_CACHE_FILE, TRANSLATION_CACHE_SIZE)
+# A self-hosted (or stub) translation service instead of Google Translate
+TRANSLATION_BACKEND_URL = os.environ.get('TRANSLATION_BACKEND_URL')
+translation_backend = (
+    HttpTranslationBackend(TRANSLATION_BACKEND_URL) if TRANSLATION_BACKEND_URL else GoogleTranslateBackend()
+)
+
+# Translator client settings: batches in flight, requests per second, retries and circuit breaker
+TRANSLATION_CONCURRENCY = int(os.environ.get('TRANSLATION_CONCURRENCY', '4'))
+TRANSLATION_RATE = float(os.environ.get('TRANSLATION_RATE', '5'))
+TRANSLATION_BURST = int(os.environ.get('TRANSLATION_BURST', '10'))
+TRANSLATION_RETRIES = int(os.environ.get('TRANSLATION_RETRIES', '3'))
+TRANSLATION_BREAKER_FAILURES = int(os.environ.get('TRANSLATION_BREAKER_FAILURES', '5'))
+TRANSLATION_BREAKER_RESET_SECONDS = float(os.environ.get('TRANSLATION_BREAKER_RESET_SECONDS', '60'))
+
+# Pipeline metrics, served in the Prometheus text format on /metrics
+metrics = MetricsRegistry()
+metrics.histogram('invoice_stage_duration_seconds', 'Time spent in each conversion stage.')
+metrics.histogram('invoice_conversion_duration_seconds', 'Time to convert one invoice end to end.')
+metrics.counter('invoice_rows_total', 'Invoice rows read.')
+metrics.counter('invoice_bytes_in_total', 'Bytes of uploaded invoices converted.')
+metrics.counter('invoice_bytes_out_total', 'Bytes of converted files written.')
+metrics.counter('invoice_conversions_total', 'Finished uploads by vendor and outcome.')
+metrics.counter('invoice_failures_total', 'Failed conversions by vendor.')
+metrics.counter('translator_calls_total', 'Batches sent to the translator.')
+metrics.counter('translator_texts_total', 'Descriptions sent to the translator.')
+metrics.counter('translator_errors_total', 'Translator calls that raised an error.')
+metrics.histogram('translator_call_duration_seconds', 'Latency of one translator call.')
+metrics.counter('translator_retries_total', 'Translator calls retried after an error.')
+metrics.counter('translator_passthrough_total', 'Descriptions left untranslated because the translator failed.')
+metrics.gauge('conversion_queue_depth', 'Uploads waiting for a conversion worker.', conversion_queue.qsize)
+metrics.gauge('translation_cache_hits', 'Descriptions served from the translation cache by this process.',
+              lambda: translation_cache.hits)
+metrics.gauge('translation_cache_misses', 'Descriptions missing from the translation cache in this process.',
+              lambda: translation_cache.misses)
+
+translation_client = AsyncTranslationClient(
+    concurrency=TRANSLATION_CONCURRENCY,
+    rate=TRANSLATION_RATE,
+    burst=TRANSLATION_BURST,
+    retries=TRANSLATION_RETRIES,
+    breaker=CircuitBreaker(TRANSLATION_BREAKER_FAILURES, TRANSLATION_BREAKER_RESET_SECONDS),
+    registry=metrics
+)
+metrics.gauge('translator_circuit_open', 'Whether the translator circuit breaker is open.',
+              lambda: int(translation_client.breaker.is_open()))
+
+# Files at least this large are read and converted in chunks
+STREAMING_THRESHOLD_BYTES = int(os.environ.get('STREAMING_THRESHOLD_BYTES', str(20 * 1024 * 1024)))
+STREAMING_CHUNK_ROWS = int(os.environ.get('STREAMING_CHUNK_ROWS', '5000'))
+
+# Uploads are checked against the vendor profile on their first rows before being queued
+UPLOAD_PREFLIGHT = os.environ.get('UPLOAD_PREFLIGHT', '1').lower() not in ('0', 'false', 'no')
+VALIDATION_SAMPLE_ROWS = int(os.environ.get('VALIDATION_SAMPLE_ROWS', '20'))
+# Most rows /validate reads and previews when a request asks for more
+VALIDATION_MAX_ROWS = int(os.environ.get('VALIDATION_MAX_ROWS', '1000'))
+
+def text_cell(value):
+    """Turn a barcode or description cell into text the way Excel shows it: 6912345678902.0 -> '6912345678902'."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def prepare_invoice_frame(df):
+    """
+    Drop rows with no values at all, read barcodes and descriptions as text and every other
+    number as a float, so whole-file and streaming conversions (whose chunks infer their own
+    dtypes) see the same values: a column is never int in one chunk and float in the next.
+    """
+    df = df.dropna(how='all')
+    for column in header_names(TEXT_COLUMNS).intersection(df.columns):
+        df[column] = df[column].astype(object).map(text_cell)
+    for column in df.columns:
+        if df[column].dtype.kind in 'iu':
+            df[column] = df[column].astype('float64')
+    return df.reset_index(drop=True)
+
+def read_invoice_sheets(file_path, rows=None):
+    """
+    Read every sheet of a workbook, opening it once, as {sheet name: DataFrame}.
+    A CSV file is a single sheet named None. rows limits how many rows are read from each sheet.
+    """
+    file_extension = os.path.splitext(file_path)[1].lower()
+    # Text columns are read as written, keeping leading zeros
+    text_dtypes = dict.fromkeys(header_names(TEXT_COLUMNS), object)
+    if file_extension == '.csv':
+        sheets = {None: pd.read_csv(file_path, nrows=rows, dtype=text_dtypes)}
+    elif file_extension == '.xlsx':
+        # pandas opens the workbook read-only and stops reading a sheet after nrows
+        sheets = pd.read_excel(file_path, sheet_name=None, engine='openpyxl', nrows=rows, dtype=text_dtypes)
+    elif file_extension == '.xls':
+        sheets = pd.read_excel(file_path, sheet_name=None, engine='xlrd', nrows=rows, dtype=text_dtypes)
+    else:
+        raise ValueError(f"Unsupported file format: {file_extension}")
+    return {sheet_name: prepare_invoice_frame(df) for sheet_name, df in sheets.items()}
+
+def read_invoice_sample(file_path, rows=None):
+    """Read the header and first rows of every sheet without loading the rest of the file."""
+    return read_invoice_sheets(file_path, rows or VALIDATION_SAMPLE_ROWS)
+
+def sheet_matches(columns, profile):
+    """True when a sheet's header has every column the profile needs."""
+    mapped = {profile.column_map.get(column, column) for column in columns}
+    return all(column in mapped for column in profile.required_columns)
+
+def invoice_columns(profile):
+    """Names, in the vendor's own header, of the columns a profile needs."""
+    return [profile.source_columns.get(column, column) for column in profile.required_columns]
+
+def select_sheets(sheets, vendor=None):
+    """Return (sheet name, DataFrame, profile) for every sheet that holds an invoice."""
+    selected = []
+    for sheet_name, df in sheets.items():
+        profile = resolve_profile(vendor, df.columns)
+        if sheet_matches(df.columns, profile):
+            selected.append((sheet_name, df, profile))
         else:
-            raise ValueError(f"Unsupported file format: {file_extension}")
-    except Exception as e:
-        app.logger.error(f"Error reading file: {str(e)}")
-        raise
+            app.logger.info(f"Skipping sheet {sheet_name}: it has no {profile.name} invoice columns")
+    if not selected:
+        profile = resolve_profile(vendor, next(iter(sheets.values())).columns)
+        raise ValueError(f"No sheet has the {profile.name} invoice columns: {', '.join(invoice_columns(profile))}")
+    return selected
+
+def iter_invoice_chunks(file_path, chunk_rows=None):
+    """
+    Yield (sheet name, DataFrame, fraction of file read) for at most chunk_rows rows at a time,
+    going through every sheet of a workbook in order. CSV chunks have the sheet name None.
+    """
+    chunk_rows = chunk_rows or STREAMING_CHUNK_ROWS
+    file_extension = os.path.splitext(file_path)[1].lower()
+    app.logger.info(f"Streaming file: {file_path} with extension: {file_extension}")
 
-def clean_descriptions(df):
+    if file_extension == '.csv':
+        file_size = os.path.getsize(file_path) or 1
+        with open(file_path, 'rb') as handle:
+            for chunk in pd.read_csv(handle, chunksize=chunk_rows, dtype=dict.fromkeys(header_names(TEXT_COLUMNS), object)):
+                yield None, prepare_invoice_frame(chunk), min(handle.tell() / file_size, 1.0)
+    elif file_extension == '.xlsx':
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            total_rows = max(sum((sheet.max_row or 1) - 1 for sheet in workbook.worksheets), 1)
+            rows_read = 0
+            for sheet in workbook.worksheets:
+                rows = sheet.iter_rows(values_only=True)
+                header = next(rows, None)
+                if header is None:
+                    continue
+                columns = [f"Unnamed: {index}" if name is None else name for index, name in enumerate(header)]
+                buffer = []
+                for row in rows:
+                    if all(value is None for value in row):
+                        continue
+                    buffer.append(row)
+                    if len(buffer) >= chunk_rows:
+                        rows_read += len(buffer)
+                        yield sheet.title, prepare_invoice_frame(pd.DataFrame(buffer, columns=columns)), min(rows_read / total_rows, 1.0)
+                        buffer = []
+                if buffer:
+                    rows_read += len(buffer)
+                    yield sheet.title, prepare_invoice_frame(pd.DataFrame(buffer, columns=columns)), min(rows_read / total_rows, 1.0)
+        finally:
+            workbook.close()
+    elif file_extension == '.xls':
+        # xlrd has no streaming reader, so .xls files are sliced after a full read
+        sheets = read_invoice_sheets(file_path)
+        total_rows = max(sum(len(df) for df in sheets.values()), 1)
+        rows_read = 0
+        for sheet_name, df in sheets.items():
+            for start in range(0, len(df), chunk_rows):
+                chunk = df.iloc[start:start + chunk_rows].reset_index(drop=True)
+                rows_read += len(chunk)
+                yield sheet_name, chunk, min(rows_read / total_rows, 1.0)
+    else:
+        raise ValueError(f"Unsupported file format: {file_extension}")
+
+def clean_descriptions(df, profile=DEFAULT_PROFILE):
     """Clean up the description field."""
     try:
         # Check if Description column exists
         if 'Description' not in df.columns:
             # Try to find a similar column name
-            possible_desc_columns = [col for col in df.columns if 'desc' in col.lower()]
+            possible_desc_columns = [
+                col for col in df.columns if any(hint in str(col).lower() for hint in profile.description_hints)
+            ]
             if possible_desc_columns:
                 df = df.rename(columns={possible_desc_columns[0]: 'Description'})
             else:
@@ -65,22 +361,22 @@ def clean_descriptions(df):
 
         # Check if Barcode column exists
         if 'Barcode' not in df.columns:
-            possible_barcode_columns = [col for col in df.columns if 'barcode' in col.lower() or 'code' in col.lower()]
+            possible_barcode_columns = [
+                col for col in df.columns if any(hint in str(col).lower() for hint in profile.barcode_hints)
+            ]
             if possible_barcode_columns:
                 df = df.rename(columns={possible_barcode_columns[0]: 'Barcode'})
             else:
                 df['Barcode'] = ''  # Create empty Barcode column if none exists
 
         # Rest of the cleaning logic
-        df['Description'] = df['Description'].apply(lambda x: re.sub(r'[箱\\P#]', '', str(x)))
-        df['Description'] = df['Description'].apply(lambda x: re.sub(r'\*[^Kg]*', '', str(x)))
-        df['Description'] = df['Description'].apply(lambda x: re.sub(r'^\d+\.', '', str(x)))
-        df['Description'] = df['Description'].apply(lambda x: re.sub(r'\b\d{3}\b', '', str(x)))
-        df['Description'] = df['Description'].apply(lambda x: re.sub(r'\.\d{2}\.', '', str(x)))
-        df['Description'] = df['Description'].apply(lambda x: re.sub(r'^[^\w\d]+', '', str(x)))
+        descriptions = df['Description'].map(str).astype(object)
+        for pattern in profile.description_patterns:
+            descriptions = descriptions.str.replace(pattern, '', regex=True)
+        df['Description'] = descriptions
         
-        if 'Barcode' in df.columns:
-            df['Barcode'] = df['Barcode'].apply(lambda x: re.sub(r'-', '', str(x)))
+        if 'Barcode' in df.columns and profile.barcode_pattern is not None:
+            df['Barcode'] = df['Barcode'].map(str).astype(object).str.replace(profile.barcode_pattern, '', regex=True)
         
         return df
     except Exception as e:
@@ -89,6 +385,8 @@ def clean_descriptions(df):
 
 def translate_text(text):
     """Translate text from Chinese to English."""
+    # Imported here so the web workers start without loading googletrans and httpx
+    from googletrans import Translator
     translator = Translator()
     try:
         return translator.translate(text, src='zh-cn', dest='en').text
@@ -96,44 +394,87 @@ def translate_text(text):
         app.logger.error(f"Translation error for text '{text}': {str(e)}")
         return text
 
-def translate_descriptions(df):
-    """Translate all descriptions to Chinese."""
+def set_translation_backend(backend):
+    """Swap the translator used for cache misses, e.g. for a local fake in tests."""
+    global translation_backend
+    translation_backend = backend
+
+def translate_descriptions(df, profile=DEFAULT_PROFILE, previous=None):
+    """
+    Translate all descriptions to Chinese. previous maps description fingerprints to
+    an earlier conversion's Description2, which is reused for rows whose text is unchanged.
+    If the translator keeps failing, descriptions are passed through untranslated and
+    listed in df.attrs, so the row fingerprints do not keep them as translations.
+    """
     try:
-        translator = Translator()
-        df['Description2'] = df['Description'].apply(lambda text: translator.translate(text, src='en', dest='zh-cn').text)
+        cache = PreviousTranslationCache(previous, translation_cache) if previous else translation_cache
+        translations, passed_through = translate_unique(
+            df['Description'],
+            cache,
+            InstrumentedTranslationBackend(translation_backend, metrics),
+            src='en',
+            dest='zh-cn',
+            batch_size=TRANSLATION_BATCH_SIZE,
+            client=translation_client
+        )
+        df['Description2'] = df['Description'].map(translations)
+        df.attrs[UNTRANSLATED_ATTR] = passed_through
         return df
     except Exception as e:
         app.logger.error(f"Error translating descriptions: {str(e)}")
         raise
 
-def update_quantity(df):
+def round_cents(values):
+    """Round to 2 decimals exactly like Python's round(), which np.round only approximates."""
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    # np.round scales by 100 first, so it can disagree with round() only next to a half cent
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_half.any():
+        rounded[near_half] = [round(value, 2) for value in values[near_half].tolist()]
+    return rounded
+
+def update_quantity(df, profile=DEFAULT_PROFILE):
     """Update quantities based on multipliers in description."""
     try:
-        def extract_and_multiply_qty(row):
-            multipliers = re.findall(r'\*(\d+)', str(row['Description']))
-            result_qty = row['Qty']
-            for multiplier in multipliers:
-                result_qty *= int(multiplier)
-            return result_qty
+        if profile.multiplier_pattern is None:
+            return df
+        multipliers = df['Description'].map(str).astype(object).str.findall(profile.multiplier_pattern).to_numpy()
+        counts = np.fromiter((len(found) for found in multipliers), dtype='int64', count=len(multipliers))
+        qty = df['Qty'].to_numpy(copy=True)
+        # Apply the multipliers in the order they appear, as the row-wise version did
+        for level in range(counts.max() if len(counts) else 0):
+            positions = np.flatnonzero(counts > level)
+            factors = np.array([int(found[level]) for found in multipliers[positions]], dtype='int64')
+            qty[positions] = qty[positions] * factors
         
-        df['Qty'] = df.apply(extract_and_multiply_qty, axis=1)
+        qty = pd.Series(qty, index=df.index)
+        df['Qty'] = qty.infer_objects() if qty.dtype == object else qty
         return df
     except Exception as e:
         app.logger.error(f"Error updating quantities: {str(e)}")
         raise
 
-def calculate_single_price(df):
+def calculate_single_price(df, profile=DEFAULT_PROFILE):
     """Calculate price per unit using StockPrice divided by Qty."""
     try:
         # Convert columns to numeric, replacing any non-numeric values with 0
         df['Qty'] = pd.to_numeric(df['Qty'], errors='coerce').fillna(0)
         df['Price'] = pd.to_numeric(df['Price'], errors='coerce').fillna(0)
         
+        if not profile.price_is_total:
+            # The vendor already prices each unit
+            df['SinglePrice'] = df['Price'].copy()
+            return df
+
         # Calculate SinglePrice as StockPrice divided by Qty
-        df['SinglePrice'] = df.apply(
-            lambda row: round(row['Price'] / row['Qty'], 2) if row['Qty'] > 0 else row['Price'],
-            axis=1
-        )
+        qty = df['Qty'].to_numpy(dtype='float64')
+        price = df['Price'].to_numpy()
+        has_qty = qty > 0
+        if has_qty.any():
+            df['SinglePrice'] = np.where(has_qty, round_cents(price / np.where(has_qty, qty, 1)), price)
+        else:
+            df['SinglePrice'] = df['Price'].copy()
         
         # Log some sample calculations for debugging
         app.logger.info("Sample price calculations:")
@@ -146,87 +487,167 @@ def calculate_single_price(df):
 
 def log_upload(filename, vendor_name, status):
     """
-    Log file upload details to a JSON file
+    Log file upload details to the upload history store
     """
     try:
-        # Ensure the log file directory exists
-        log_dir = os.path.dirname(UPLOAD_LOG_FILE)
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # Create log entry
-        log_entry = {
-            'filename': filename,
-            'vendor': vendor_name,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'status': status
-        }
-        
-        logs = []
-        # Read existing logs if file exists
-        if os.path.exists(UPLOAD_LOG_FILE):
-            try:
-                with open(UPLOAD_LOG_FILE, 'r') as f:
-                    logs = json.load(f)
-            except json.JSONDecodeError:
-                logger.error("Error reading log file, starting fresh")
-                logs = []
-        
-        # Append new log
-        logs.append(log_entry)
-        
-        # Write updated logs with proper permissions
-        with open(UPLOAD_LOG_FILE, 'w') as f:
-            json.dump(logs, f, indent=4)
-        
-        # Set proper permissions for the log file
-        if os.name != 'nt':  # If not Windows
-            os.chmod(UPLOAD_LOG_FILE, 0o666)
-            
+        log_entry = upload_history.log(filename, vendor_name, status)
         logger.info(f"Upload logged successfully: {log_entry}")
-        
     except Exception as e:
         logger.error(f"Error logging upload: {str(e)}", exc_info=True)
 
-def map_columns(df):
+def map_columns(df, profile=DEFAULT_PROFILE):
     """Map original column names to required column names"""
     try:
         # Create the mapping
-        df = df.rename(columns={
-            'Description1': 'Description',
-            'StockQty': 'Qty',
-            'StockPrice': 'Price',  # Map StockPrice instead of SalesPrice1
-            'Barcode1': 'Barcode'
-        })
+        df = df.rename(columns=profile.column_map)
         
         # Log the columns for debugging
-        app.logger.info(f"Columns after mapping: {df.columns.tolist()}")
+        app.logger.info(f"Columns after mapping for {profile.name}: {df.columns.tolist()}")
         
         # Verify the required columns exist
-        required_columns = ['Description', 'Qty', 'Price']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        
+        missing_columns = [col for col in profile.required_columns if col not in df.columns]
         if missing_columns:
-            # If columns are missing, check if they exist under original names
-            original_names = {
-                'Description': 'Description1',
-                'Qty': 'StockQty',
-                'Price': 'StockPrice'
-            }
-            
-            # Try to map any missing columns from their original names
-            for missing_col in missing_columns:
-                original_name = original_names.get(missing_col)
-                if original_name in df.columns:
-                    df[missing_col] = df[original_name]
+            app.logger.warning(f"Columns missing after mapping for {profile.name}: {missing_columns}")
         
         return df
     except Exception as e:
         app.logger.error(f"Error mapping columns: {str(e)}")
         raise ValueError(f"Error mapping columns: {str(e)}")
 
+def link_or_copy(source_path, target_path):
+    """Hard-link target_path to source_path, copying only where links are not supported."""
+    if os.path.abspath(source_path) == os.path.abspath(target_path):
+        return
+    # Link under a unique name and swap it in, so readers never see target_path missing
+    temp_path = f"{target_path}.{uuid.uuid4().hex}.part"
+    try:
+        try:
+            os.link(source_path, temp_path)
+        except OSError:
+            shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, target_path)
+    finally:
+        # rename() leaves both names when they already link the same file
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def link_conversion(source_output, output_path):
+    """Link an earlier conversion, and the row fingerprints stored with it, to a new output path."""
+    link_or_copy(source_output, output_path)
+    if os.path.exists(fingerprint_path(source_output)):
+        os.makedirs(os.path.dirname(fingerprint_path(output_path)), exist_ok=True)
+        link_or_copy(fingerprint_path(source_output), fingerprint_path(output_path))
+
+def file_sha256(path):
+    """Hash a stored file in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def save_upload(stream, upload_path):
+    """
+    Stream an uploaded file into the content-addressed object store, hashing it on the way,
+    and link it to upload_path. Returns the SHA-256 of the contents.
+    """
+    os.makedirs(OBJECT_STORE_FOLDER, exist_ok=True)
+    if isinstance(stream, HashingSpoolFile) and stream.hash_valid:
+        # Already on disk and hashed while the request was parsed
+        stream.flush()
+        content_hash = stream.digest.hexdigest()
+        object_path = os.path.join(OBJECT_STORE_FOLDER, content_hash[:2], content_hash)
+        if os.path.exists(object_path):
+            app.logger.info(f"Upload matches stored object {content_hash}")
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            link_or_copy(stream.name, object_path)
+        link_or_copy(object_path, upload_path)
+        return content_hash
+    digest = hashlib.sha256()
+    temp_path = os.path.join(OBJECT_STORE_FOLDER, f".{uuid.uuid4().hex}.part")
+    try:
+        with open(temp_path, 'wb') as target:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                target.write(chunk)
+        content_hash = digest.hexdigest()
+        object_path = os.path.join(OBJECT_STORE_FOLDER, content_hash[:2], content_hash)
+        if os.path.exists(object_path):
+            app.logger.info(f"Upload matches stored object {content_hash}")
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.replace(temp_path, object_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    link_or_copy(object_path, upload_path)
+    return content_hash
+
+def file_uploaded_at(file_stat):
+    return datetime.fromtimestamp(file_stat.st_ctime).strftime('%Y-%m-%d %H:%M:%S')
+
+def index_upload(vendor_name, upload_path, previous_mtime):
+    """
+    Add a saved upload to the vendor's file index, so listing the folder needs no rescan.
+    previous_mtime is the folder's mtime from before the upload was saved.
+    """
+    try:
+        file_stat = os.stat(upload_path)
+        upload_history.record_file(
+            vendor_name, os.path.basename(upload_path), file_uploaded_at(file_stat), file_stat.st_size,
+            previous_mtime, os.stat(os.path.dirname(upload_path)).st_mtime_ns
+        )
+    except Exception as e:
+        # The next listing sees the folder changed and rescans it
+        app.logger.warning(f"Could not index upload {upload_path}: {str(e)}")
+
+def scan_vendor_uploads(vendor_name, vendor_folder, folder_mtime):
+    """Rebuild a vendor's file index from one pass over the folder."""
+    files = []
+    with os.scandir(vendor_folder) as entries:
+        for entry in entries:
+            if entry.is_file():
+                file_stat = entry.stat()
+                files.append((entry.name, file_uploaded_at(file_stat), file_stat.st_size))
+    upload_history.replace_files(vendor_name, files, folder_mtime)
+    app.logger.info(f"Indexed {len(files)} uploaded files for {vendor_name}")
+
+def processed_output_path(vendor_name, filename, output_format='xlsx', sheets='combined'):
+    """Return the path of the converted file for an uploaded file; a zip when sheets are kept separate."""
+    output_filename = f"{vendor_name}_{os.path.splitext(filename)[0]}{OUTPUT_EXTENSIONS[output_format]}"
+    if sheets == 'separate':
+        output_filename += '.zip'
+    return os.path.join(PROCESSED_FOLDER, vendor_name, output_filename)
+
+def profiling_requested():
+    """True when the request asks for its conversion to be profiled."""
+    if not ALLOW_PROFILING:
+        return False
+    flag = request.headers.get('X-Profile') or request.args.get('profile') or request.form.get('profile') or ''
+    return flag.lower() in ('1', 'true', 'yes')
+
+def profile_urls(vendor_name, filename):
+    """Download URLs of the report and cProfile stats saved for an upload's conversion."""
+    return {
+        'report': f'/profiles/{vendor_name}/{filename}.txt',
+        'stats': f'/profiles/{vendor_name}/{filename}.prof'
+    }
+
+def conversion_version(output_format, sheets='combined'):
+    """Key under which conversions are cached: the pipeline version plus the output format and sheet mode."""
+    if sheets == 'separate':
+        return f"{PIPELINE_VERSION}/{output_format}/separate"
+    return f"{PIPELINE_VERSION}/{output_format}"
+
 def ensure_directory_permissions():
     """Ensure all required directories have correct permissions"""
-    directories = [UPLOAD_FOLDER, PROCESSED_FOLDER, DESKTOP_DOWNLOADS]
+    directories = [UPLOAD_FOLDER, PROCESSED_FOLDER]
+    if COPY_DOWNLOADS_TO_DESKTOP:
+        directories.append(DESKTOP_DOWNLOADS)
     for directory in directories:
         try:
             os.makedirs(directory, exist_ok=True)
@@ -237,9 +658,343 @@ def ensure_directory_permissions():
             logger.error(f"Permission error creating directory {directory}: {str(e)}")
             raise
 
+# Conversion stages applied after reading: (status message, progress, function)
+PIPELINE_STAGES = [
+    ("Mapping columns...", 0.2, map_columns),
+    ("Processing quantities...", 0.4, update_quantity),
+    ("Calculating prices...", 0.6, calculate_single_price),
+    ("Cleaning descriptions...", 0.8, clean_descriptions),
+    ("Translating descriptions...", 0.9, translate_descriptions),
+]
+
+def validate_sheet(sample, vendor=None):
+    """Check one sheet's sample against its vendor profile and preview it cleaned but untranslated."""
+    profile = resolve_profile(vendor, sample.columns)
+    result = {
+        'valid': False,
+        'profile': profile.name,
+        'columns': [str(column) for column in sample.columns],
+        'missing': [],
+        'preview': []
+    }
+    df = map_columns(sample, profile)
+    missing = [col for col in profile.required_columns if col not in df.columns]
+    if missing:
+        result['missing'] = [profile.source_columns.get(col, col) for col in missing]
+        result['message'] = f"Missing {profile.name} columns: {', '.join(result['missing'])}"
+        return result
+    try:
+        for _, _, stage in PIPELINE_STAGES:
+            if stage not in (map_columns, translate_descriptions):
+                df = stage(df, profile)
+    except Exception as e:
+        result['message'] = str(e)
+        return result
+    result['valid'] = True
+    result['message'] = f"Looks like a {profile.name} invoice"
+    result['preview'] = df.astype(object).where(df.notna(), None).to_dict('records')
+    return result
+
+def validate_invoice(file_path, vendor=None, rows=None):
+    """
+    Check an invoice against its vendor profile using only the header and first rows of each sheet.
+    The result describes the first sheet that holds an invoice (or the first sheet, if none does),
+    and lists every sheet under 'sheets'.
+    """
+    results = {
+        sheet_name: validate_sheet(sample, vendor)
+        for sheet_name, sample in read_invoice_sample(file_path, rows).items()
+    }
+    result = next((result for result in results.values() if result['valid']), next(iter(results.values())))
+    result = dict(result)
+    result['sheets'] = [
+        {'name': sheet_name, 'valid': sheet['valid'], 'message': sheet['message']}
+        for sheet_name, sheet in results.items()
+    ]
+    valid_sheets = sum(sheet['valid'] for sheet in results.values())
+    if valid_sheets > 1:
+        result['message'] = f"{valid_sheets} {result['profile']} invoice sheets found"
+    return result
+
+def use_streaming(upload_path):
+    """Decide whether a file is large enough to be converted in chunks."""
+    return os.path.getsize(upload_path) >= STREAMING_THRESHOLD_BYTES
+
+def convert_sheet(df, profile, report, stage_options):
+    """Run one sheet through every pipeline stage."""
+    for message, progress, stage in PIPELINE_STAGES:
+        report(message, progress)
+        with metrics.time('invoice_stage_duration_seconds', stage=stage.__name__):
+            df = stage(df, profile, **stage_options.get(stage, {}))
+    return df
+
+def write_sheet_chunks(sheet_chunks, output_path, output_format, sheet_prefix=None):
+    """
+    Write (sheet name, chunk) pairs to one output file. With sheet_prefix, output_path is
+    a zip holding one file per sheet instead, named <sheet_prefix>_<n>_<sheet name>.
+    """
+    if sheet_prefix is None:
+        write_chunks((chunk for _, chunk in sheet_chunks), output_path, output_format, xlsx_engine=XLSX_ENGINE)
+        return
+    temp_dir = tempfile.mkdtemp(dir=os.path.dirname(output_path))
+    try:
+        writers = {}
+        try:
+            for sheet_name, chunk in sheet_chunks:
+                if sheet_name not in writers:
+                    safe_name = secure_filename(str(sheet_name or ''))
+                    sheet_file = f"{sheet_prefix}_{len(writers) + 1:02d}{'_' + safe_name if safe_name else ''}"
+                    writers[sheet_name] = open_output_writer(
+                        output_format, os.path.join(temp_dir, f"{sheet_file}{OUTPUT_EXTENSIONS[output_format]}"),
+                        xlsx_engine=XLSX_ENGINE
+                    )
+                writers[sheet_name].write(chunk)
+        finally:
+            for writer in writers.values():
+                writer.close()
+        if not writers:
+            raise ValueError("No rows found in the uploaded file")
+        with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for writer in writers.values():
+                archive.write(writer.path, os.path.basename(writer.path))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def convert_whole_file(upload_path, output_path, output_format, report, vendor=None, previous=None,
+                       on_chunk=None, sheet_prefix=None):
+    """Convert an invoice held in memory, converting the sheets of a multi-invoice workbook concurrently."""
+    report("Reading Excel file...", 0.1)
+    with metrics.time('invoice_stage_duration_seconds', stage='read_excel_file'):
+        sheets = select_sheets(read_invoice_sheets(upload_path), vendor)
+    metrics.inc('invoice_rows_total', sum(len(df) for _, df, _ in sheets))
+    stage_options = {translate_descriptions: {'previous': previous}}
+
+    if len(sheets) == 1:
+        sheet_name, df, profile = sheets[0]
+        app.logger.info(f"Converting {upload_path} with the {profile.name} profile")
+        converted = [(sheet_name, convert_sheet(df, profile, report, stage_options))]
+    else:
+        app.logger.info(
+            f"Converting {len(sheets)} sheets of {upload_path} with the {sheets[0][2].name} profile"
+        )
+        sheet_progress = {sheet_name: 0.1 for sheet_name, _, _ in sheets}
+        progress_lock = Lock()
+
+        def sheet_report(sheet_name):
+            def report_sheet(message, progress):
+                # Overall progress is the average over sheets, reported with the sheet that moved
+                with progress_lock:
+                    sheet_progress[sheet_name] = progress
+                    report(f"Sheet {sheet_name}: {message}", sum(sheet_progress.values()) / len(sheet_progress))
+            return report_sheet
+
+        # Threads are enough: while one sheet waits on the translator another is cleaned
+        with ThreadPoolExecutor(max_workers=max(min(SHEET_WORKERS, len(sheets)), 1)) as executor:
+            futures = [
+                (sheet_name, executor.submit(convert_sheet, df, profile, sheet_report(sheet_name), stage_options))
+                for sheet_name, df, profile in sheets
+            ]
+            converted = [(sheet_name, future.result()) for sheet_name, future in futures]
+    if on_chunk is not None:
+        for _, df in converted:
+            on_chunk(df)
+
+    # Save processed file
+    report("Saving converted file...", 0.95)
+    with metrics.time('invoice_stage_duration_seconds', stage='write_output'):
+        write_sheet_chunks(converted, output_path, output_format, sheet_prefix)
+
+def convert_streaming(upload_path, output_path, output_format, report, vendor=None, previous=None,
+                      on_chunk=None, sheet_prefix=None):
+    """
+    Convert an invoice chunk by chunk, writing each chunk out before reading the next.
+    Sheets are converted one after another; those without the invoice columns are skipped.
+    on_chunk(chunk) sees every converted chunk before it is written.
+    """
+    stage_options = {translate_descriptions: {'previous': previous}}
+
+    def processed_chunks():
+        rows_done = 0
+        sheet = object()
+        profile = None
+        skip_sheet = False
+        converted_sheets = 0
+        chunks = iter_invoice_chunks(upload_path)
+        while True:
+            with metrics.time('invoice_stage_duration_seconds', stage='read_excel_file'):
+                item = next(chunks, None)
+            if item is None:
+                break
+            sheet_name, chunk, fraction_read = item
+            if sheet_name != sheet:
+                # Every chunk of a sheet shares its first chunk's header
+                sheet = sheet_name
+                profile = resolve_profile(vendor, chunk.columns)
+                skip_sheet = not sheet_matches(chunk.columns, profile)
+                if skip_sheet:
+                    app.logger.info(f"Skipping sheet {sheet_name}: it has no {profile.name} invoice columns")
+                else:
+                    converted_sheets += 1
+                    app.logger.info(f"Converting sheet {sheet_name} of {upload_path} with the {profile.name} profile")
+            if skip_sheet:
+                continue
+            metrics.inc('invoice_rows_total', len(chunk))
+            for _, _, stage in PIPELINE_STAGES:
+                with metrics.time('invoice_stage_duration_seconds', stage=stage.__name__):
+                    chunk = stage(chunk, profile, **stage_options.get(stage, {}))
+            if on_chunk is not None:
+                on_chunk(chunk)
+            rows_done += len(chunk)
+            sheet_label = f"Sheet {sheet_name}: " if sheet_name is not None else ''
+            report(f"{sheet_label}Converted {rows_done} rows...", 0.1 + 0.85 * fraction_read)
+            # The writer appends the chunk while this generator is suspended
+            with metrics.time('invoice_stage_duration_seconds', stage='write_output'):
+                yield sheet_name, chunk
+        if not converted_sheets and profile is not None:
+            raise ValueError(f"No sheet has the {profile.name} invoice columns: {', '.join(invoice_columns(profile))}")
+
+    report("Reading Excel file...", 0.1)
+    write_sheet_chunks(processed_chunks(), output_path, output_format, sheet_prefix)
+
+def upload_date(upload_path):
+    """Date an upload arrived, from the timestamp its stored name starts with."""
+    try:
+        return datetime.strptime(os.path.basename(upload_path)[:8], '%Y%m%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return datetime.now().strftime('%Y-%m-%d')
+
+def convert_file(upload_path, output_path, report=None, vendor=None, reuse_translations=False):
+    """
+    Convert an uploaded invoice into the Enrich format at output_path; the extension picks the writer.
+    Every sheet of a workbook that holds an invoice is converted, into the one output, or into
+    one file per sheet when output_path is a zip named after the format (invoice.xlsx.zip).
+    The vendor name picks the vendor profile; without a registered one the header decides.
+    report(message, progress) is called as stages start; it is omitted in batch worker processes.
+    With reuse_translations, rows whose cleaned description matches the fingerprints stored
+    with the existing output keep its translation instead of being translated again.
+    """
+    report = report or (lambda message, progress: None)
+    folder, name = os.path.split(output_path)
+    stem, extension = os.path.splitext(name)
+    sheet_prefix = None
+    if extension.lower() == '.zip':
+        # KAISI_invoice.xlsx.zip holds one .xlsx file per sheet
+        sheet_prefix, extension = os.path.splitext(stem)
+    output_format = extension.lstrip('.').lower()
+    os.makedirs(folder, exist_ok=True)
+    previous = load_previous_translations(output_path) if reuse_translations else None
+    # Write beside the target and swap it in, since outputs may be hard-linked to earlier conversions
+    temp_path = os.path.join(folder, f".{name}.{uuid.uuid4().hex}.part")
+    # Row fingerprints and the price archive see each converted chunk, and keep it only if the conversion succeeds
+    sinks = [FingerprintWriter(output_path)]
+    if PRICE_ARCHIVE_ENABLED:
+        sinks.append(ArchiveWriter(price_archive, vendor or 'unknown', upload_date(upload_path), name))
+
+    def on_chunk(chunk):
+        for sink in sinks:
+            sink.write(chunk)
+
+    try:
+        with metrics.time('invoice_conversion_duration_seconds'):
+            if use_streaming(upload_path):
+                app.logger.info(f"Converting {upload_path} in chunks of {STREAMING_CHUNK_ROWS} rows")
+                convert_streaming(upload_path, temp_path, output_format, report, vendor, previous,
+                                  on_chunk=on_chunk, sheet_prefix=sheet_prefix)
+            else:
+                convert_whole_file(upload_path, temp_path, output_format, report, vendor, previous,
+                                   on_chunk=on_chunk, sheet_prefix=sheet_prefix)
+        os.replace(temp_path, output_path)
+        for sink in sinks:
+            sink.close()
+    except Exception:
+        for sink in sinks:
+            sink.discard()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    metrics.inc('invoice_bytes_in_total', os.path.getsize(upload_path))
+    metrics.inc('invoice_bytes_out_total', os.path.getsize(output_path))
+    return output_path
+
+def convert_file_in_worker(upload_path, output_path, vendor=None):
+    """Batch process entry point: convert one file and hand the worker's metrics back to the parent."""
+    convert_file(upload_path, output_path, vendor=vendor)
+    return metrics.drain()
+
+def process_upload(job):
+    """Run the conversion pipeline for a queued upload job."""
+    vendor_name = job['vendor']
+    filename = job['filename']
+    original_filename = job['original_filename']
+    try:
+        sheets = job.get('sheets', 'combined')
+        output_path = processed_output_path(vendor_name, filename, job['output_format'], sheets)
+        profiler = None
+        if job.get('profile'):
+            profiler = ConversionProfiler(*profile_paths(os.path.dirname(output_path), filename))
+
+        def report(message, progress):
+            if profiler is not None:
+                profiler.checkpoint(message)
+            update_processing_status(vendor_name, original_filename, message, progress, job_id=job['id'])
+
+        with profiler or nullcontext():
+            convert_file(
+                job['upload_path'],
+                output_path,
+                report=report,
+                vendor=vendor_name,
+                reuse_translations=job.get('reprocess', False)
+            )
+        
+        upload_history.record_conversion(
+            job['content_hash'], vendor_name, conversion_version(job['output_format'], sheets), output_path
+        )
+        
+        # Set final status to Completed! with progress 1.0
+        update_processing_status(
+            vendor_name, original_filename, "Completed!", 1.0,
+            job_id=job['id'], output_filename=os.path.basename(output_path)
+        )
+        log_upload(filename, vendor_name, 'completed')
+        metrics.inc('invoice_conversions_total', vendor=vendor_name, outcome='completed')
+    except Exception as e:
+        metrics.inc('invoice_conversions_total', vendor=vendor_name, outcome='failed')
+        metrics.inc('invoice_failures_total', vendor=vendor_name)
+        log_upload(filename, vendor_name, f'failed: {str(e)}')
+        update_processing_status(vendor_name, original_filename, 'Error', 1.0, job_id=job['id'], error=str(e))
+        app.logger.error(f"Error processing upload {filename}: {str(e)}")
+
+def conversion_worker():
+    """Take jobs off the conversion queue and process them one at a time."""
+    while True:
+        job = conversion_queue.get()
+        try:
+            process_upload(job)
+        except Exception as e:
+            logger.error(f"Unexpected error in conversion worker: {str(e)}", exc_info=True)
+        finally:
+            conversion_queue.task_done()
+
+def start_conversion_workers():
+    """Start the conversion worker pool on first use."""
+    with workers_lock:
+        if conversion_workers:
+            return
+        for index in range(CONVERSION_WORKERS):
+            worker = Thread(target=conversion_worker, name=f"conversion-worker-{index}", daemon=True)
+            worker.start()
+            conversion_workers.append(worker)
+        logger.info(f"Started {CONVERSION_WORKERS} conversion workers (queue size {CONVERSION_QUEUE_SIZE})")
+
+def enqueue_conversion(job):
+    """Put a job on the conversion queue, raising queue.Full when it is at capacity."""
+    start_conversion_workers()
+    conversion_queue.put_nowait(job)
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    """Handle file upload and processing."""
+    """Save an uploaded file and queue it for conversion."""
     try:
         logger.debug(f"Operating System: {os.name}")
         logger.debug(f"Current working directory: {os.getcwd()}")
@@ -260,6 +1015,18 @@ def upload_file():
         if not vendor_name:
             return jsonify({'success': False, 'message': 'Vendor name required'})
 
+        output_format = request.form.get('format') or OUTPUT_FORMAT
+        if output_format not in OUTPUT_EXTENSIONS:
+            return jsonify({'success': False, 'message': f'Unsupported output format: {output_format}'})
+        sheets = request.form.get('sheets') or SHEETS_MODE
+        if sheets not in SHEETS_MODES:
+            return jsonify({'success': False, 'message': f'sheets must be one of {", ".join(SHEETS_MODES)}'})
+
+        # Refuse new work before saving anything when the queue is already full
+        if conversion_queue.full():
+            app.logger.warning("Conversion queue is full, rejecting upload")
+            return jsonify({'success': False, 'message': 'Server is busy, please try again shortly'}), 429
+
         # Create vendor-specific folder in uploads
         vendor_upload_folder = os.path.join(UPLOAD_FOLDER, vendor_name)
         os.makedirs(vendor_upload_folder, exist_ok=True)
@@ -270,85 +1037,465 @@ def upload_file():
         filename = f"{timestamp}_{original_filename}"
         upload_path = os.path.join(vendor_upload_folder, filename)
         
-        update_processing_status(vendor_name, original_filename, "Saving file...", 0.1)
-        file.save(upload_path)
-        app.logger.info(f"File saved to: {upload_path}")
+        job_id = uuid.uuid4().hex
+        update_processing_status(vendor_name, original_filename, "Saving file...", 0.1, job_id=job_id)
+        folder_mtime = os.stat(vendor_upload_folder).st_mtime_ns
+        content_hash = save_upload(file.stream, upload_path)
+        index_upload(vendor_name, upload_path, folder_mtime)
+        app.logger.info(f"File saved to: {upload_path} (sha256 {content_hash})")
 
         # Log the upload
         log_upload(filename, vendor_name, 'uploaded')
 
-        # Process file with detailed status updates
-        update_processing_status(vendor_name, original_filename, "Reading Excel file...", 0.1)
-        df = read_excel_file(upload_path)
-        
-        update_processing_status(vendor_name, original_filename, "Mapping columns...", 0.2)
-        df = map_columns(df)
-        
-        update_processing_status(vendor_name, original_filename, "Processing quantities...", 0.4)
-        df = update_quantity(df)
-        
-        update_processing_status(vendor_name, original_filename, "Calculating prices...", 0.6)
-        df = calculate_single_price(df)
-        
-        update_processing_status(vendor_name, original_filename, "Cleaning descriptions...", 0.8)
-        df = clean_descriptions(df)
-        
-        update_processing_status(vendor_name, original_filename, "Translating descriptions...", 0.9)
-        df = translate_descriptions(df)
-        
-        # Save processed file
-        update_processing_status(vendor_name, original_filename, "Saving converted file...", 0.95)
-        vendor_folder = os.path.join(PROCESSED_FOLDER, vendor_name)
-        os.makedirs(vendor_folder, exist_ok=True)
-        
-        output_filename = f"{vendor_name}_{os.path.splitext(filename)[0]}.xlsx"
-        output_path = os.path.join(vendor_folder, output_filename)
-        df.to_excel(output_path, index=False)
-        
-        # Set final status to Completed! with progress 1.0
-        update_processing_status(vendor_name, original_filename, "Completed!", 1.0)
-        log_upload(filename, vendor_name, 'completed')
+        # Reject files that do not match the vendor before any expensive work is queued
+        if UPLOAD_PREFLIGHT:
+            validation = validate_invoice(upload_path, vendor_name)
+            if not validation['valid']:
+                log_upload(filename, vendor_name, f"failed: {validation['message']}")
+                update_processing_status(
+                    vendor_name, original_filename, 'Error', 1.0, job_id=job_id, error=validation['message']
+                )
+                app.logger.warning(f"Rejected {filename}: {validation['message']}")
+                return jsonify({
+                    'success': False,
+                    'message': f"This file does not look like a {validation['profile']} invoice: {validation['message']}",
+                    'missing': validation['missing'],
+                    'columns': validation['columns']
+                })
+
+        # The same bytes converted by the same pipeline version need no new conversion, unless it is being profiled
+        profile = profiling_requested()
+        cached_output = upload_history.find_conversion(content_hash, vendor_name, conversion_version(output_format, sheets))
+        if cached_output and os.path.exists(cached_output) and not profile:
+            output_path = processed_output_path(vendor_name, filename, output_format, sheets)
+            link_conversion(cached_output, output_path)
+            app.logger.info(f"Reusing earlier conversion {cached_output} for {filename}")
+            update_processing_status(
+                vendor_name, original_filename, "Completed!", 1.0,
+                job_id=job_id, output_filename=os.path.basename(output_path)
+            )
+            log_upload(filename, vendor_name, 'completed')
+            metrics.inc('invoice_conversions_total', vendor=vendor_name, outcome='cached')
+            return jsonify({'success': True, 'message': 'File processed successfully', 'jobId': job_id, 'cached': True})
+
+        job = {
+            'id': job_id,
+            'vendor': vendor_name,
+            'filename': filename,
+            'original_filename': original_filename,
+            'upload_path': upload_path,
+            'content_hash': content_hash,
+            'output_format': output_format,
+            'sheets': sheets,
+            'profile': profile
+        }
+        try:
+            enqueue_conversion(job)
+        except queue.Full:
+            log_upload(filename, vendor_name, 'failed: server busy')
+            update_processing_status(vendor_name, original_filename, 'Error', 1.0, job_id=job_id, error='Server is busy')
+            app.logger.warning(f"Conversion queue is full, rejecting {filename}")
+            return jsonify({'success': False, 'message': 'Server is busy, please try again shortly'}), 429
 
-        return jsonify({'success': True, 'message': 'File processed successfully'})
+        update_processing_status(vendor_name, original_filename, "Queued for processing...", 0.1, job_id=job_id)
+        response = {'success': True, 'message': 'File queued for processing', 'jobId': job_id}
+        if profile:
+            response['profile'] = profile_urls(vendor_name, filename)
+        return jsonify(response)
 
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
-        log_upload(filename, vendor_name, f'failed: {str(e)}')  # Log failure
+        # Log failed upload
+        if 'filename' in locals():
+            log_upload(filename, vendor_name, f'failed: {str(e)}')
+            update_processing_status(vendor_name, original_filename, 'Error', 1.0, error=str(e))
         app.logger.error(f"Error processing upload: {str(e)}")
         return jsonify({'success': False, 'message': f"An error occurred while processing the file: {str(e)}"})
-        
-        # Clear the status after a delay (optional)
-        def clear_status():
-            time.sleep(5)  # Wait 5 seconds
-            with status_lock:
-                status_key = f"{vendor_name}_{original_filename}"
-                if status_key in processing_status:
-                    del processing_status[status_key]
-        
-        # Start the cleanup in a separate thread
-        from threading import Thread
-        Thread(target=clear_status, daemon=True).start()
-        
-        logger.debug("Processing file...")
-        logger.debug("File processing complete")
+
+@app.route('/validate', methods=['POST'])
+def validate_upload():
+    """Check an invoice against the vendor profile and preview its first rows, without converting it."""
+    temp_path = None
+    try:
+        if 'file' not in request.files:
+            return jsonify({'success': False, 'message': 'No file uploaded'})
+        file = request.files['file']
+        if not file or not file.filename:
+            return jsonify({'success': False, 'message': 'No file selected'})
+        file_extension = os.path.splitext(file.filename)[1].lower()
+        if file_extension not in SUPPORTED_EXTENSIONS:
+            return jsonify({'success': False, 'message': f'Unsupported file format: {file_extension}'})
+        try:
+            rows = min(max(int(request.form.get('rows', VALIDATION_SAMPLE_ROWS)), 1), VALIDATION_MAX_ROWS)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'rows must be an integer'}), 400
+
+        # Readers pick the format by extension, so the upload is kept under its own
+        temp_handle, temp_path = tempfile.mkstemp(suffix=file_extension)
+        with os.fdopen(temp_handle, 'wb') as target:
+            shutil.copyfileobj(file.stream, target, UPLOAD_CHUNK_BYTES)
+        validation = validate_invoice(temp_path, request.form.get('vendor'), rows)
+        return jsonify({'success': True, **validation})
+    except RequestEntityTooLarge:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error validating upload: {str(e)}")
+        return jsonify({'success': False, 'message': f"Could not read the file: {str(e)}"})
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+@app.route('/reprocess', methods=['POST'])
+def reprocess_uploads():
+    """
+    Convert stored uploads again with the current pipeline: one file, or every converted file
+    for a vendor between from/to. Unchanged descriptions keep their earlier translations.
+    """
+    try:
+        params = request.get_json(silent=True) or request.form
+        vendor_name = params.get('vendor')
+        filename = params.get('filename')
+        if not vendor_name:
+            return jsonify({'success': False, 'message': 'Vendor name required'})
+
+        if filename:
+            filenames = [filename]
+        else:
+            date_to = params.get('to')
+            if date_to and len(date_to) == 10:
+                date_to = f"{date_to} 23:59:59"
+            filenames = []
+            cursor = None
+            while True:
+                entries, cursor = upload_history.query(
+                    limit=HISTORY_MAX_PAGE_SIZE, cursor=int(cursor) if cursor else None,
+                    vendor=vendor_name, date_from=params.get('from'), date_to=date_to
+                )
+                filenames.extend(entry['filename'] for entry in entries)
+                if cursor is None:
+                    break
+            filenames = list(dict.fromkeys(filenames))
+
+        jobs = []
+        skipped = []
+        # A JSON body can ask for profiling too, besides the header and query flag
+        profile = profiling_requested() or (
+            ALLOW_PROFILING and str(params.get('profile', '')).lower() in ('1', 'true', 'yes')
+        )
+        for name in filenames:
+            upload_path = os.path.join(UPLOAD_FOLDER, vendor_name, secure_filename(name))
+            # Convert again into whichever output the file already has, unless told otherwise
+            existing_format, existing_sheets = next(
+                ((fmt, mode) for fmt in OUTPUT_EXTENSIONS for mode in SHEETS_MODES
+                 if os.path.exists(processed_output_path(vendor_name, name, fmt, mode))), (None, None)
+            )
+            output_format = params.get('format') or existing_format
+            sheets = params.get('sheets') or existing_sheets or SHEETS_MODE
+            if not os.path.exists(upload_path) or output_format not in OUTPUT_EXTENSIONS or sheets not in SHEETS_MODES:
+                skipped.append(name)
+                continue
+            job = {
+                'id': uuid.uuid4().hex,
+                'vendor': vendor_name,
+                'filename': name,
+                # Status is reported under the name the file was uploaded with
+                'original_filename': re.sub(r'^\d{8}_\d{6}_(\d{3}_)?', '', name),
+                'upload_path': upload_path,
+                'content_hash': file_sha256(upload_path),
+                'output_format': output_format,
+                'sheets': sheets,
+                'reprocess': True,
+                'profile': profile
+            }
+            try:
+                enqueue_conversion(job)
+            except queue.Full:
+                skipped.append(name)
+                continue
+            update_processing_status(vendor_name, job['original_filename'], "Queued for reprocessing...", 0.1, job_id=job['id'])
+            jobs.append({'filename': name, 'jobId': job['id']})
+            if profile:
+                jobs[-1]['profile'] = profile_urls(vendor_name, name)
+
+        app.logger.info(f"Queued {len(jobs)} files of {vendor_name} for reprocessing, skipped {len(skipped)}")
+        if not jobs and skipped and conversion_queue.full():
+            return jsonify({'success': False, 'message': 'Server is busy, please try again shortly', 'skipped': skipped}), 429
         return jsonify({
             'success': True,
-            'message': 'File processed successfully',
+            'message': f'Queued {len(jobs)} files for reprocessing',
+            'jobs': jobs,
+            'skipped': skipped
         })
+    except Exception as e:
+        app.logger.error(f"Error reprocessing uploads: {str(e)}")
+        return jsonify({'success': False, 'message': f"An error occurred while reprocessing: {str(e)}"})
 
-    except ValueError as e:
-        # Log failed processing with specific error
-        if 'filename' in locals():
-            log_upload(filename, vendor_name, f'failed: {str(e)}')
-            update_processing_status(vendor_name, original_filename, f"Error: {str(e)}", 1.0)
-        app.logger.error(f"Validation error: {str(e)}")
-        return jsonify({'success': False, 'message': str(e)})
+def get_batch_pool():
+    """Create the batch process pool on first use."""
+    global batch_pool
+    with workers_lock:
+        if batch_pool is None:
+            # spawn keeps worker processes clear of the locks held by this process's threads
+            batch_pool = ProcessPoolExecutor(
+                max_workers=BATCH_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=set_translation_backend,
+                initargs=(translation_backend,)
+            )
+            logger.info(f"Started batch process pool with {BATCH_PROCESSES} processes")
+        return batch_pool
+
+def reset_batch_pool(broken_pool):
+    """Drop a pool whose worker process died so the next submit starts a fresh one."""
+    global batch_pool
+    with workers_lock:
+        if batch_pool is not broken_pool:
+            return
+        batch_pool = None
+    broken_pool.shutdown(wait=False, cancel_futures=True)
+    logger.warning("Batch process pool broke; a new one starts with the next batch file")
+
+def reset_if_broken(pool, future):
+    """A worker that dies fails every pending future with BrokenProcessPool, and every later submit too."""
+    if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+        reset_batch_pool(pool)
+
+def submit_batch_file(batch_id, entry, vendor_name):
+    """Hand one batch file to the process pool, restarting the pool once if it has broken."""
+    for attempt in range(2):
+        pool = get_batch_pool()
+        try:
+            future = pool.submit(convert_file_in_worker, entry['upload_path'], entry['output_path'], vendor_name)
+        except BrokenProcessPool:
+            reset_batch_pool(pool)
+            if attempt:
+                raise
+            continue
+        future.add_done_callback(lambda done: finish_batch_file(batch_id, entry, done))
+        future.add_done_callback(lambda done: reset_if_broken(pool, done))
+        return
+
+def iter_batch_files(files):
+    """Yield (original filename, stream) for each uploaded invoice, expanding zip archives."""
+    for file in files:
+        if not file or not file.filename:
+            continue
+        if os.path.splitext(file.filename)[1].lower() == '.zip':
+            with zipfile.ZipFile(file.stream) as archive:
+                for member in archive.infolist():
+                    name = os.path.basename(member.filename)
+                    if member.is_dir() or member.filename.startswith('__MACOSX') or not name:
+                        continue
+                    if os.path.splitext(name)[1].lower() not in SUPPORTED_EXTENSIONS:
+                        continue
+                    with archive.open(member) as stream:
+                        yield name, stream
+        else:
+            yield file.filename, file.stream
+
+def batch_archive_path(vendor_name, batch_id):
+    """Return where the zip of a batch's converted files is built."""
+    return os.path.join(PROCESSED_FOLDER, '.batches', f"{vendor_name}_batch_{batch_id}.zip")
+
+def evict_batch_jobs(now):
+    """Forget expired batches and the oldest beyond BATCH_MAX_JOBS; call with batch_lock held."""
+    while batch_jobs:
+        batch_id, batch = next(iter(batch_jobs.items()))
+        if len(batch_jobs) <= BATCH_MAX_JOBS and now - batch['updated_at'] < BATCH_TTL_SECONDS:
+            break
+        del batch_jobs[batch_id]
+        archive_path = batch_archive_path(batch['vendor'], batch_id)
+        if os.path.exists(archive_path):
+            os.remove(archive_path)
+
+def get_batch(batch_id):
+    """Return a batch that has not expired, or None; call with batch_lock held."""
+    evict_batch_jobs(time.time())
+    return batch_jobs.get(batch_id)
+
+def finish_batch_file(batch_id, entry, future):
+    """Record the outcome of one batch conversion once its worker process returns."""
+    try:
+        metrics.merge(future.result())
+        upload_history.record_conversion(
+            entry['content_hash'], entry['vendor'], conversion_version(entry['output_format'], entry['sheets']),
+            entry['output_path']
+        )
+        log_upload(entry['filename'], entry['vendor'], 'completed')
+        metrics.inc('invoice_conversions_total', vendor=entry['vendor'], outcome='completed')
+        status, error = 'Completed!', None
     except Exception as e:
-        # Log failed processing
-        if 'filename' in locals():
-            log_upload(filename, vendor_name, f'failed: {str(e)}')
-            update_processing_status(vendor_name, original_filename, f"Error: {str(e)}", 1.0)
-        app.logger.error(f"Error processing upload: {str(e)}")
-        return jsonify({'success': False, 'message': f"An error occurred while processing the file: {str(e)}"})
+        metrics.inc('invoice_conversions_total', vendor=entry['vendor'], outcome='failed')
+        metrics.inc('invoice_failures_total', vendor=entry['vendor'])
+        log_upload(entry['filename'], entry['vendor'], f'failed: {str(e)}')
+        app.logger.error(f"Error processing batch file {entry['filename']}: {str(e)}")
+        status, error = 'Error', str(e)
+    with batch_lock:
+        entry['status'] = status
+        if error:
+            entry['error'] = error
+        if batch_id in batch_jobs:
+            batch_jobs[batch_id]['updated_at'] = time.time()
+            batch_jobs.move_to_end(batch_id)
+
+def fail_batch_files(batch_id, entries, error):
+    """Mark batch files that never reached a worker as failed, so the batch can still finish."""
+    for entry in entries:
+        metrics.inc('invoice_conversions_total', vendor=entry['vendor'], outcome='failed')
+        metrics.inc('invoice_failures_total', vendor=entry['vendor'])
+        log_upload(entry['filename'], entry['vendor'], f'failed: {error}')
+    with batch_lock:
+        for entry in entries:
+            entry['status'] = 'Error'
+            entry['error'] = error
+        if batch_id in batch_jobs:
+            batch_jobs[batch_id]['updated_at'] = time.time()
+
+@app.route('/upload-batch', methods=['POST'])
+def upload_batch():
+    """Save several invoices (or a zip of them) and convert them in parallel worker processes."""
+    try:
+        ensure_directory_permissions()
+        vendor_name = request.form.get('vendor')
+        files = request.files.getlist('files') + request.files.getlist('file')
+        if not files:
+            return jsonify({'success': False, 'message': 'No files uploaded'})
+        if not vendor_name:
+            return jsonify({'success': False, 'message': 'Vendor name required'})
+        output_format = request.form.get('format') or OUTPUT_FORMAT
+        if output_format not in OUTPUT_EXTENSIONS:
+            return jsonify({'success': False, 'message': f'Unsupported output format: {output_format}'})
+        sheets = request.form.get('sheets') or SHEETS_MODE
+        if sheets not in SHEETS_MODES:
+            return jsonify({'success': False, 'message': f'sheets must be one of {", ".join(SHEETS_MODES)}'})
+
+        vendor_upload_folder = os.path.join(UPLOAD_FOLDER, vendor_name)
+        os.makedirs(vendor_upload_folder, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        batch_id = uuid.uuid4().hex
+        entries = []
+
+        for name, stream in iter_batch_files(files):
+            if len(entries) >= BATCH_MAX_FILES:
+                return jsonify({'success': False, 'message': f'A batch can hold at most {BATCH_MAX_FILES} files'}), 400
+            original_filename = secure_filename(name)
+            filename = f"{timestamp}_{len(entries) + 1:03d}_{original_filename}"
+            upload_path = os.path.join(vendor_upload_folder, filename)
+            folder_mtime = os.stat(vendor_upload_folder).st_mtime_ns
+            content_hash = save_upload(stream, upload_path)
+            index_upload(vendor_name, upload_path, folder_mtime)
+            log_upload(filename, vendor_name, 'uploaded')
+            entries.append({
+                'vendor': vendor_name,
+                'filename': filename,
+                'original_filename': original_filename,
+                'upload_path': upload_path,
+                'output_path': processed_output_path(vendor_name, filename, output_format, sheets),
+                'output_format': output_format,
+                'sheets': sheets,
+                'content_hash': content_hash,
+                'status': 'Processing...'
+            })
+
+        if not entries:
+            return jsonify({'success': False, 'message': 'No supported invoice files found'})
+
+        with batch_lock:
+            batch_jobs[batch_id] = {'vendor': vendor_name, 'files': entries, 'updated_at': time.time()}
+            evict_batch_jobs(time.time())
+
+        for position, entry in enumerate(entries):
+            try:
+                cached_output = upload_history.find_conversion(entry['content_hash'], vendor_name, conversion_version(output_format, sheets))
+                if cached_output and os.path.exists(cached_output):
+                    link_conversion(cached_output, entry['output_path'])
+                    log_upload(entry['filename'], vendor_name, 'completed')
+                    metrics.inc('invoice_conversions_total', vendor=vendor_name, outcome='cached')
+                    with batch_lock:
+                        entry['status'] = 'Completed!'
+                    continue
+                submit_batch_file(batch_id, entry, vendor_name)
+            except Exception as e:
+                # The batch is already visible to /batch-status; settle the files that were not handed out
+                app.logger.error(f"Error queueing batch {batch_id}: {str(e)}")
+                fail_batch_files(batch_id, entries[position:], f"Could not start conversion: {str(e)}")
+                break
+
+        app.logger.info(f"Batch {batch_id} queued {len(entries)} files for {vendor_name}")
+        return jsonify({'success': True, 'message': f'{len(entries)} files queued for processing', 'batchId': batch_id}), 202
+    except zipfile.BadZipFile:
+        return jsonify({'success': False, 'message': 'The uploaded zip archive is damaged'}), 400
+    except RequestEntityTooLarge:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error processing batch upload: {str(e)}")
+        return jsonify({'success': False, 'message': f"An error occurred while processing the files: {str(e)}"})
+
+@app.route('/batch-status/<batch_id>')
+def get_batch_status(batch_id):
+    """Get the combined processing status of a batch upload"""
+    with batch_lock:
+        batch = get_batch(batch_id)
+        if batch is None:
+            return jsonify({'success': False, 'message': 'Unknown batch'}), 404
+        files = []
+        for entry in batch['files']:
+            file = {key: entry[key] for key in ('filename', 'original_filename', 'status', 'error') if key in entry}
+            if entry['status'] == 'Completed!':
+                file['downloadUrl'] = f"/downloads/{batch['vendor']}/{os.path.basename(entry['output_path'])}"
+            files.append(file)
+
+    completed = sum(1 for file in files if file['status'] == 'Completed!')
+    failed = sum(1 for file in files if file['status'] == 'Error')
+    done = completed + failed == len(files)
+    response = {
+        'success': True,
+        'batchId': batch_id,
+        'status': ('Completed!' if not failed else 'Completed with errors') if done else 'Processing...',
+        'progress': (completed + failed) / len(files),
+        'completed': completed,
+        'failed': failed,
+        'total': len(files),
+        'files': files
+    }
+    if done and completed:
+        response['downloadUrl'] = f'/batch-download/{batch_id}'
+    return jsonify(response)
+
+@app.route('/batch-download/<batch_id>')
+def download_batch(batch_id):
+    """Download every converted file of a batch as one zip archive"""
+    try:
+        with batch_lock:
+            batch = get_batch(batch_id)
+            if batch is None:
+                return jsonify({'success': False, 'message': 'Unknown batch'}), 404
+            if any(entry['status'] == 'Processing...' for entry in batch['files']):
+                return jsonify({'success': False, 'message': 'Batch is still processing'}), 409
+            outputs = [entry['output_path'] for entry in batch['files'] if entry['status'] == 'Completed!']
+        if not outputs:
+            return jsonify({'success': False, 'message': 'No converted files for this batch'}), 404
+
+        archive_path = batch_archive_path(batch['vendor'], batch_id)
+        archive_folder, archive_name = os.path.split(archive_path)
+        os.makedirs(archive_folder, exist_ok=True)
+        if not os.path.exists(archive_path):
+            # XLSX files are already compressed, so store them as they are.
+            # Concurrent downloads each build their own temp file; the last replace wins
+            temp_path = f"{archive_path}.{uuid.uuid4().hex}.part"
+            try:
+                with zipfile.ZipFile(temp_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+                    for output_path in outputs:
+                        archive.write(output_path, os.path.basename(output_path))
+                os.replace(temp_path, archive_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        return send_from_directory(archive_folder, archive_name, as_attachment=True, download_name=archive_name)
+    except Exception as e:
+        app.logger.error(f"Batch download error: {str(e)}")
+        return jsonify({'success': False, 'message': 'Download failed'}), 500
 
 @app.route('/downloads/<vendor>/<filename>')
 def download_file(vendor, filename):
@@ -362,28 +1509,78 @@ def download_file(vendor, filename):
             app.logger.error(f"File not found in processed folder: {processed_file_path}")
             return jsonify({'success': False, 'message': 'File not found'}), 404
 
-        # Create downloads directory if it doesn't exist
-        os.makedirs(DESKTOP_DOWNLOADS, exist_ok=True)
+        if COPY_DOWNLOADS_TO_DESKTOP:
+            os.makedirs(DESKTOP_DOWNLOADS, exist_ok=True)
+            download_path = os.path.join(DESKTOP_DOWNLOADS, filename)
+            shutil.copy2(processed_file_path, download_path)
+            app.logger.info(f"File copied to downloads: {download_path}")
         
-        # Copy file to downloads folder
-        import shutil
-        download_path = os.path.join(DESKTOP_DOWNLOADS, filename)
-        shutil.copy2(processed_file_path, download_path)
-        
-        app.logger.info(f"File copied to downloads: {download_path}")
-        
-        # Return the file from the processed folder
+        # Served straight from the processed folder; conditional requests and Range are honoured
         return send_from_directory(
             vendor_processed_folder,
             filename,
             as_attachment=True,
-            download_name=filename
+            download_name=filename,
+            conditional=True,
+            etag=True,
+            max_age=DOWNLOAD_MAX_AGE
         )
             
     except Exception as e:
         app.logger.error(f"Download error: {str(e)}")
         return jsonify({'success': False, 'message': 'Download failed'}), 500
 
+@app.route('/profiles/<vendor>/<filename>')
+def download_profile(vendor, filename):
+    """Download a conversion profile: the text report (.txt) or the cProfile stats (.prof)."""
+    try:
+        profile_folder = os.path.dirname(profile_paths(os.path.join(PROCESSED_FOLDER, vendor), filename)[0])
+        if not os.path.exists(os.path.join(profile_folder, filename)):
+            return jsonify({'success': False, 'message': 'Profile not found'}), 404
+        return send_from_directory(
+            profile_folder,
+            filename,
+            as_attachment=not filename.endswith('.txt'),
+            mimetype='text/plain' if filename.endswith('.txt') else 'application/octet-stream'
+        )
+    except Exception as e:
+        app.logger.error(f"Profile download error: {str(e)}")
+        return jsonify({'success': False, 'message': 'Download failed'}), 500
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    """Answer oversized uploads in the same JSON shape as other upload errors."""
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] / (1024 * 1024)
+    return jsonify({'success': False, 'message': f'File is too large (limit {limit_mb:.0f} MB)'}), 413
+
+@app.route('/prices/<barcode>')
+def get_price_history(barcode):
+    """Unit price history of one barcode across every archived invoice, newest first"""
+    try:
+        try:
+            limit = min(max(int(request.args.get('limit', PRICE_HISTORY_MAX_ROWS)), 1), PRICE_HISTORY_MAX_ROWS)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'limit must be an integer', 'prices': []}), 400
+        barcode = normalize_barcode(barcode)
+        if barcode is None:
+            return jsonify({'success': False, 'message': 'barcode must contain digits', 'prices': []}), 400
+        prices = price_archive.history(
+            barcode,
+            vendor=request.args.get('vendor'),
+            date_from=request.args.get('from'),
+            date_to=request.args.get('to'),
+            limit=limit
+        )
+        return jsonify({'success': True, 'barcode': barcode, 'prices': prices})
+    except Exception as e:
+        app.logger.error(f"Error reading price history for {barcode}: {str(e)}")
+        return jsonify({'success': False, 'message': str(e), 'prices': []})
+
+@app.route('/metrics')
+def export_metrics():
+    """Expose pipeline metrics for Prometheus"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def home():
     return send_from_directory('static', 'converter.html')
@@ -394,51 +1591,94 @@ def history():
 
 @app.route('/upload-history')
 def view_upload_history():
-    """View the upload history"""
+    """View a page of the upload history, newest first"""
     try:
-        logger.debug(f"Attempting to read upload history from: {UPLOAD_LOG_FILE}")
-        
-        if os.path.exists(UPLOAD_LOG_FILE):
-            try:
-                with open(UPLOAD_LOG_FILE, 'r') as f:
-                    logs = json.load(f)
-                
-                # Add download status information
-                for log in logs:
-                    if 'downloaded_at' in log:
-                        log['status'] = f"Downloaded at {log['downloaded_at']}"
-                
-                logger.debug(f"Successfully loaded {len(logs)} log entries")
-                return jsonify({'success': True, 'logs': logs})
-            except json.JSONDecodeError as e:
-                logger.error(f"Error decoding JSON from log file: {str(e)}")
-                return jsonify({'success': False, 'message': 'Error reading log file', 'logs': []})
+        # Unchanged history answers conditional requests without touching the uploads table.
+        # Only the revision ETag is trusted: Last-Modified has whole-second resolution, so two
+        # changes within a second would make If-Modified-Since answer 304 for new entries
+        revision, modified_at = upload_history.revision()
+        query_hash = hashlib.sha1(request.query_string).hexdigest()[:12]
+        etag = f"{revision}-{query_hash}"
+        last_modified = datetime.fromtimestamp(int(modified_at), tz=timezone.utc)
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
         else:
-            logger.debug("No upload history file found, returning empty list")
-            return jsonify({'success': True, 'logs': []})
+            try:
+                limit = min(max(int(request.args.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+                cursor = request.args.get('cursor')
+                cursor = int(cursor) if cursor else None
+            except ValueError:
+                return jsonify({'success': False, 'message': 'limit and cursor must be integers', 'logs': []}), 400
+
+            date_to = request.args.get('to')
+            if date_to and len(date_to) == 10:
+                # A bare date includes the whole day
+                date_to = f"{date_to} 23:59:59"
+
+            logs, next_cursor = upload_history.query(
+                limit=limit,
+                cursor=cursor,
+                vendor=request.args.get('vendor'),
+                status=request.args.get('status'),
+                date_from=request.args.get('from'),
+                date_to=date_to
+            )
+            
+            # Add download status information
+            profiled_vendors = {}
+            for log in logs:
+                if 'downloaded_at' in log:
+                    log['status'] = f"Downloaded at {log['downloaded_at']}"
+                # Link the profile of conversions that were run under the profiler;
+                # vendors that were never profiled cost one check per page
+                _, report_path = profile_paths(os.path.join(PROCESSED_FOLDER, log['vendor']), log['filename'])
+                if log['vendor'] not in profiled_vendors:
+                    profiled_vendors[log['vendor']] = os.path.isdir(os.path.dirname(report_path))
+                if profiled_vendors[log['vendor']] and os.path.exists(report_path):
+                    log['profile'] = profile_urls(log['vendor'], log['filename'])
+            
+            logger.debug(f"Loaded {len(logs)} log entries")
+            response = jsonify({'success': True, 'logs': logs, 'nextCursor': next_cursor})
+
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        return response
     except Exception as e:
         logger.error(f"Error retrieving upload history: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'message': str(e), 'logs': []})
 
 @app.route('/uploads/<vendor_name>')
 def list_uploaded_files(vendor_name):
-    """List all files uploaded by a specific vendor"""
+    """
+    List a page of the files uploaded by a specific vendor.
+    sort is uploaded_at (default), filename or size; order is desc (default) or asc.
+    """
     try:
         vendor_folder = os.path.join(UPLOAD_FOLDER, vendor_name)
         if not os.path.exists(vendor_folder):
-            return jsonify({'success': True, 'files': []})
-        
-        files = []
-        for filename in os.listdir(vendor_folder):
-            file_path = os.path.join(vendor_folder, filename)
-            if os.path.isfile(file_path):
-                files.append({
-                    'filename': filename,
-                    'uploaded_at': datetime.fromtimestamp(os.path.getctime(file_path)).strftime('%Y-%m-%d %H:%M:%S'),
-                    'size': os.path.getsize(file_path)
-                })
-        
-        return jsonify({'success': True, 'files': files})
+            return jsonify({'success': True, 'files': [], 'total': 0})
+
+        sort = request.args.get('sort', 'uploaded_at')
+        order = request.args.get('order', 'desc')
+        if sort not in ('uploaded_at', 'filename', 'size') or order not in ('asc', 'desc'):
+            return jsonify({'success': False, 'message': 'sort must be uploaded_at, filename or size and order asc or desc', 'files': []}), 400
+        try:
+            limit = min(max(int(request.args.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+            offset = max(int(request.args.get('offset', 0)), 0)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'limit and offset must be integers', 'files': []}), 400
+
+        # The index is rebuilt only when the folder changed behind the app's back
+        folder_mtime = os.stat(vendor_folder).st_mtime_ns
+        if upload_history.folder_version(vendor_name) != folder_mtime:
+            scan_vendor_uploads(vendor_name, vendor_folder, folder_mtime)
+
+        total, files = upload_history.list_files(
+            vendor_name, sort=sort, descending=order == 'desc', limit=limit, offset=offset
+        )
+        next_offset = offset + len(files) if offset + len(files) < total else None
+        return jsonify({'success': True, 'files': files, 'total': total, 'nextOffset': next_offset})
     except Exception as e:
         app.logger.error(f"Error listing uploaded files: {str(e)}")
         return jsonify({'success': False, 'message': str(e)})
@@ -458,35 +1698,35 @@ def download_original_file(vendor_name, filename):
 
 @app.route('/process-status/<vendor>/<filename>')
 def get_process_status(vendor, filename):
-    """Get the processing status for a specific file"""
+    """Get the processing status for a specific file, or for one upload of it with ?job=<job id>"""
     try:
-        status_key = f"{vendor}_{filename}"
-        with status_lock:
-            status = processing_status.get(status_key)
-            if status is None:
-                # Check if the processed file exists
-                processed_filename = f"{vendor}_{os.path.splitext(filename)[0]}.xlsx"
-                processed_path = os.path.join(PROCESSED_FOLDER, vendor, processed_filename)
-                if os.path.exists(processed_path):
-                    app.logger.info(f"Found processed file at: {processed_path}")
-                    download_url = f'/downloads/{vendor}/{processed_filename}'
-                    app.logger.info(f"Generated download URL: {download_url}")
-                    return jsonify({
-                        'status': 'Completed!',
-                        'progress': 1.0,
-                        'downloadUrl': download_url
-                    })
+        job_id = request.args.get('job')
+        status_key = job_status_key(job_id) if job_id else f"{vendor}_{filename}"
+        status = processing_status.get(status_key)
+        if status is None:
+            # Check if the processed file exists
+            processed_filename = f"{vendor}_{os.path.splitext(filename)[0]}.xlsx"
+            processed_path = os.path.join(PROCESSED_FOLDER, vendor, processed_filename)
+            if os.path.exists(processed_path):
+                app.logger.debug(f"Found processed file at: {processed_path}")
+                download_url = f'/downloads/{vendor}/{processed_filename}'
+                app.logger.debug(f"Generated download URL: {download_url}")
+                return jsonify({
+                    'status': 'Completed!',
+                    'progress': 1.0,
+                    'downloadUrl': download_url
+                })
+        
+        # If file is still processing, return current status
+        if status:
+            app.logger.debug(f"Current processing status: {status}")
+            return jsonify(status)
             
-            # If file is still processing, return current status
-            if status:
-                app.logger.info(f"Current processing status: {status}")
-                return jsonify(status)
-                
-            # Default response if no status found
-            return jsonify({
-                'status': 'Processing...',
-                'progress': 0.5
-            })
+        # Default response if no status found
+        return jsonify({
+            'status': 'Processing...',
+            'progress': 0.5
+        })
     except Exception as e:
         app.logger.error(f"Error getting process status: {str(e)}")
         return jsonify({
@@ -495,30 +1735,74 @@ def get_process_status(vendor, filename):
             'error': str(e)
         }), 200
 
+@app.route('/process-events/<job_id>')
+def stream_process_events(job_id):
+    """Push status changes for a conversion job as Server-Sent Events"""
+    status_key = job_status_key(job_id)
+    if processing_status.get(status_key) is None:
+        return jsonify({'success': False, 'message': 'Unknown job'}), 404
 
-def update_processing_status(vendor, filename, status, progress):
-    """Update the processing status for a specific file"""
+    def events():
+        last_version = None
+        while True:
+            # Works across worker processes when the status store is shared
+            status, version = processing_status.wait_for_change(
+                status_key, last_version, timeout=SSE_KEEPALIVE_SECONDS
+            )
+            if status is None:
+                # Evicted from the status store; the history page still has the outcome
+                return
+            if version == last_version:
+                yield ": keep-alive\n\n"
+                continue
+            last_version = version
+            yield f"data: {json.dumps(status)}\n\n"
+            if status['status'] in ('Completed!', 'Error'):
+                return
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def job_status_key(job_id):
+    """Status key of one upload, so uploads of the same file name never share progress."""
+    return f"job:{job_id}"
+
+def update_processing_status(vendor, filename, status, progress, job_id=None, error=None, output_filename=None):
+    """Update the processing status for a specific file, and for the upload job when there is one"""
     try:
         status_key = f"{vendor}_{filename}"
-        with status_lock:
-            # When processing is complete, include the download URL
-            if progress >= 1.0 or status == 'Completed!':
-                processed_filename = f"{vendor}_{os.path.splitext(filename)[0]}.xlsx"
-                # Save to processed folder path
-                processed_path = os.path.join(PROCESSED_FOLDER, vendor, processed_filename)
-                processing_status[status_key] = {
-                    'status': status,
-                    'progress': progress,
-                    'downloadUrl': f'/downloads/{vendor}/{processed_filename}'
-                }
-                app.logger.info(f"Updated status with download URL for {status_key}")
-                app.logger.info(f"Processed file path: {processed_path}")
-            else:
-                processing_status[status_key] = {
-                    'status': status,
-                    'progress': progress
-                }
-            app.logger.info(f"Status updated for {status_key}: {processing_status[status_key]}")
+        if error is not None:
+            entry = {
+                'status': status,
+                'progress': progress,
+                'error': error
+            }
+        # When processing is complete, include the download URL
+        elif progress >= 1.0 or status == 'Completed!':
+            processed_filename = output_filename or f"{vendor}_{os.path.splitext(filename)[0]}.xlsx"
+            # Save to processed folder path
+            processed_path = os.path.join(PROCESSED_FOLDER, vendor, processed_filename)
+            entry = {
+                'status': status,
+                'progress': progress,
+                'downloadUrl': f'/downloads/{vendor}/{processed_filename}'
+            }
+            app.logger.info(f"Updated status with download URL for {status_key}")
+            app.logger.info(f"Processed file path: {processed_path}")
+        else:
+            entry = {
+                'status': status,
+                'progress': progress
+            }
+        if job_id:
+            entry['jobId'] = job_id
+            processing_status.set(job_status_key(job_id), entry)
+        processing_status.set(status_key, entry)
+        app.logger.info(f"Status updated for {status_key}: {entry}")
     except Exception as e:
         app.logger.error(f"Error updating process status: {str(e)}")
 
@@ -533,25 +1817,9 @@ def update_download_status():
         if not vendor or not filename:
             return jsonify({'success': False, 'message': 'Vendor and filename required'})
         
-        # Read current logs
-        if os.path.exists(UPLOAD_LOG_FILE):
-            with open(UPLOAD_LOG_FILE, 'r') as f:
-                logs = json.load(f)
-            
-            # Find and update the relevant log entry
-            for log in logs:
-                if log['filename'] == filename and log['vendor'] == vendor:
-                    log['status'] = 'Downloaded'
-                    log['downloaded_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            # Write updated logs back to file
-            with open(UPLOAD_LOG_FILE, 'w') as f:
-                json.dump(logs, f, indent=4)
-            
-            logger.info(f"Updated download status for {filename}")
-            return jsonify({'success': True})
-        
-        return jsonify({'success': False, 'message': 'No log file found'})
+        updated = upload_history.mark_downloaded(vendor, filename)
+        logger.info(f"Updated download status for {filename} ({updated} entries)")
+        return jsonify({'success': True})
         
     except Exception as e:
         logger.error(f"Error updating download status: {str(e)}", exc_info=True)
@@ -560,21 +1828,10 @@ def update_download_status():
 def update_file_status(filename, vendor, status):
     """Update the status of a file in the upload log"""
     try:
-        with open('upload_log.json', 'r') as f:
-            logs = json.load(f)
-        
-        # Find and update the matching entry
-        for log in logs:
-            if log['filename'] == filename and log['vendor'] == vendor:
-                log['status'] = status
-                break
-        
-        with open('upload_log.json', 'w') as f:
-            json.dump(logs, f, indent=4)
-        
+        upload_history.update_status(vendor, filename, status)
         return True
     except Exception as e:
-        print(f"Error updating file status: {e}")
+        logger.error(f"Error updating file status: {str(e)}", exc_info=True)
         return False
 
 @app.route('/update-file-status', methods=['POST'])
@@ -594,4 +1851,6 @@ def handle_status_update():
         return jsonify({'success': False, 'message': str(e)})
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', '5000')),
+            debug=os.environ.get('FLASK_DEBUG', '').lower() in ('1', 'true', 'yes'))
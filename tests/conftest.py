@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ.setdefault('TRANSLATION_RATE', '0')
+
+SAMPLE = os.path.join(TESTS_DIR, 'data', 'kaisi_sample.csv')
+
+
+class CountingTranslator:
+    """Translate instantly and count the requests, so tests can tell what reached the translator."""
+
+    def __init__(self):
+        self.calls = 0
+        self.texts = []
+
+    def translate_batch(self, texts, src, dest):
+        self.calls += 1
+        self.texts.extend(texts)
+        return [f"[{dest}] {text}" for text in texts]
+
+
+@pytest.fixture
+def translator():
+    return CountingTranslator()
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch, translator):
+    """The app with a counting translator and its translation cache and price archive under tmp_path."""
+    import submitButtonHandling
+    from priceArchive import PriceArchive
+    from translationCache import TranslationCache
+
+    monkeypatch.setattr(submitButtonHandling, 'translation_backend', translator)
+    monkeypatch.setattr(submitButtonHandling, 'translation_cache',
+                        TranslationCache(str(tmp_path / 'translation_cache.db')))
+    monkeypatch.setattr(submitButtonHandling, 'price_archive',
+                        PriceArchive(str(tmp_path / 'price_index.db'), str(tmp_path / 'archive')))
+    return submitButtonHandling
@@ -0,0 +1,81 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from conftest import SAMPLE
+
+
+class FakePool:
+    """Run batch files in this process, or fail every submit like a pool whose worker died."""
+
+    def __init__(self, broken):
+        self.broken = broken
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        if self.broken:
+            raise BrokenProcessPool('A worker process terminated abruptly')
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+@pytest.fixture
+def batch_app(app_module, tmp_path, monkeypatch):
+    from uploadHistory import UploadHistoryStore
+
+    monkeypatch.setattr(app_module, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    monkeypatch.setattr(app_module, 'PROCESSED_FOLDER', str(tmp_path / 'processed'))
+    monkeypatch.setattr(app_module, 'OBJECT_STORE_FOLDER', str(tmp_path / 'uploads' / '.objects'))
+    monkeypatch.setattr(app_module, 'upload_history', UploadHistoryStore(str(tmp_path / 'upload_history.db')))
+    monkeypatch.setattr(app_module, 'batch_pool', None)
+    return app_module
+
+
+def use_pools(app_module, monkeypatch, *pools):
+    """Make get_batch_pool hand out the given pools, one per restart."""
+    created = iter(pools)
+    monkeypatch.setattr(app_module, 'ProcessPoolExecutor', lambda **kwargs: next(created))
+
+
+def upload_batch(app_module, count=2):
+    files = [(open(SAMPLE, 'rb'), f"invoice_{number}.csv") for number in range(count)]
+    try:
+        response = app_module.app.test_client().post(
+            '/upload-batch', data={'vendor': 'KAISI', 'format': 'csv', 'files': files},
+            content_type='multipart/form-data')
+    finally:
+        for stream, _ in files:
+            stream.close()
+    assert response.status_code == 202
+    return response.get_json()['batchId']
+
+
+def test_broken_pool_is_replaced(batch_app, monkeypatch):
+    broken, fresh = FakePool(broken=True), FakePool(broken=False)
+    use_pools(batch_app, monkeypatch, broken, fresh)
+
+    batch_id = upload_batch(batch_app)
+
+    status = batch_app.app.test_client().get(f'/batch-status/{batch_id}').get_json()
+    assert (status['completed'], status['failed']) == (2, 0)
+    assert broken.shut_down
+    assert batch_app.batch_pool is fresh
+
+
+def test_files_that_never_reached_a_worker_fail(batch_app, monkeypatch):
+    use_pools(batch_app, monkeypatch, FakePool(broken=True), FakePool(broken=True))
+
+    batch_id = upload_batch(batch_app)
+
+    client = batch_app.app.test_client()
+    status = client.get(f'/batch-status/{batch_id}').get_json()
+    assert status['status'] == 'Completed with errors'
+    assert (status['completed'], status['failed']) == (0, 2)
+    assert all('worker process' in file['error'] for file in status['files'])
+    assert batch_app.batch_pool is None
+    assert client.get(f'/batch-download/{batch_id}').status_code != 409
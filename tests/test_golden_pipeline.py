@@ -0,0 +1,42 @@
+"""
+Golden-file test for the vectorized conversion stages.
+
+kaisi_sample_golden.csv was produced from kaisi_sample.csv by the row-wise map_columns,
+update_quantity, calculate_single_price and clean_descriptions as they were before they were
+vectorized (the parent of commit 142e4b5). The current stages have to reproduce it exactly.
+"""
+import os
+import sys
+
+import pandas as pd
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+from submitButtonHandling import PIPELINE_STAGES, translate_descriptions  # noqa: E402
+from vendorProfiles import KAISI  # noqa: E402
+
+SAMPLE = os.path.join(TESTS_DIR, 'data', 'kaisi_sample.csv')
+GOLDEN = os.path.join(TESTS_DIR, 'data', 'kaisi_sample_golden.csv')
+
+
+def convert_sample():
+    df = pd.read_csv(SAMPLE)
+    for _, _, stage in PIPELINE_STAGES:
+        if stage is not translate_descriptions:
+            df = stage(df, KAISI)
+    return df
+
+
+def test_stages_match_golden_output():
+    with open(GOLDEN, 'r', encoding='utf-8') as f:
+        golden = f.read()
+    assert convert_sample().to_csv(index=False) == golden
+
+
+def test_stages_keep_golden_dtypes():
+    golden = pd.read_csv(GOLDEN)
+    converted = convert_sample()
+    assert list(converted.columns) == list(golden.columns)
+    for column in ('Qty', 'Price', 'SinglePrice'):
+        assert converted[column].dtype == golden[column].dtype, column
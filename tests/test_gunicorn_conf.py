@@ -0,0 +1,19 @@
+import os
+import runpy
+
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gunicorn.conf.py')
+
+
+def test_threads_cover_every_admitted_job(monkeypatch):
+    monkeypatch.delenv('WEB_THREADS', raising=False)
+    monkeypatch.setenv('CONVERSION_QUEUE_SIZE', '50')
+    monkeypatch.setenv('CONVERSION_WORKERS', '4')
+
+    # Each admitted job may keep a /process-events stream, and so a thread, busy until it finishes
+    assert runpy.run_path(CONFIG)['threads'] > 50 + 4
+
+
+def test_web_threads_overrides(monkeypatch):
+    monkeypatch.setenv('WEB_THREADS', '12')
+
+    assert runpy.run_path(CONFIG)['threads'] == 12
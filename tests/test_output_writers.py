@@ -0,0 +1,29 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from outputWriters import write_chunks
+
+
+def test_parquet_takes_wider_values_in_later_chunks(tmp_path):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'out.parquet')
+    write_chunks([
+        pd.DataFrame({'Qty': [2, 3], 'Note': [None, None]}),
+        pd.DataFrame({'Qty': [1.5, None], 'Note': ['late', None]}),
+    ], path, 'parquet')
+    written = pd.read_parquet(path)
+    assert written['Qty'].tolist()[:3] == [2.0, 3.0, 1.5]
+    assert written['Note'].tolist()[2] == 'late'
+
+
+@pytest.mark.parametrize('engine', ['xlsxwriter', 'openpyxl'])
+def test_xlsx_dates_keep_a_date_format(tmp_path, engine):
+    pytest.importorskip(engine)
+    from openpyxl import load_workbook
+    path = str(tmp_path / 'out.xlsx')
+    write_chunks([pd.DataFrame({'Date': [datetime(2026, 1, 2, 10, 30)]})], path, 'xlsx', xlsx_engine=engine)
+    cell = load_workbook(path).active['A2']
+    assert cell.value == datetime(2026, 1, 2, 10, 30)
+    assert cell.number_format == 'yyyy-mm-dd hh:mm:ss'
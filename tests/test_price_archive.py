@@ -0,0 +1,31 @@
+import pandas as pd
+import pytest
+
+
+def fractional_invoice(path):
+    """A 20-row KAISI invoice with whole quantities except a 1.5 in row 16."""
+    pd.DataFrame({
+        'Barcode1': [f"690000000{row:04d}" for row in range(20)],
+        'Description1': [f"Item {row}" for row in range(20)],
+        'StockQty': [2] * 15 + [1.5] + [3] * 4,
+        'StockPrice': [10] * 20,
+        'SalesPrice1': [12] * 20,
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def test_archive_accepts_wider_numbers_in_later_chunks(app_module, tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    monkeypatch.setattr(app_module, 'PRICE_ARCHIVE_ENABLED', True)
+    monkeypatch.setattr(app_module, 'STREAMING_THRESHOLD_BYTES', 0)
+    monkeypatch.setattr(app_module, 'STREAMING_CHUNK_ROWS', 10)
+    upload_path = fractional_invoice(tmp_path / '20260101_120000_invoice.csv')
+
+    app_module.convert_file(upload_path, str(tmp_path / 'out.csv'), vendor='KAISI')
+
+    archived = pd.read_parquet(tmp_path / 'archive')
+    assert len(archived) == 20
+    assert archived['Qty'].dtype == 'float64'
+    assert archived['Qty'].sum() == pytest.approx(2 * 15 + 1.5 + 3 * 4)
+    history = app_module.price_archive.history('6900000000015')
+    assert [row['qty'] for row in history] == [1.5]
@@ -0,0 +1,31 @@
+import pandas as pd
+import pytest
+
+from conftest import SAMPLE
+
+
+def convert(app_module, monkeypatch, upload_path, output_path, streaming):
+    monkeypatch.setattr(app_module, 'STREAMING_THRESHOLD_BYTES', 0 if streaming else 10 ** 12)
+    monkeypatch.setattr(app_module, 'STREAMING_CHUNK_ROWS', 10)
+    app_module.convert_file(upload_path, output_path, vendor='KAISI')
+    with open(output_path, 'r', encoding='utf-8-sig') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('extension', ['.csv', '.xlsx'])
+def test_streaming_matches_whole_file_conversion(app_module, tmp_path, monkeypatch, extension):
+    upload_path = str(tmp_path / f"20260101_120000_kaisi{extension}")
+    sample = pd.read_csv(SAMPLE, dtype={'Barcode1': str})
+    # A blank row in the middle of a chunk
+    sample = pd.concat([sample.iloc[:25], pd.DataFrame([[None] * len(sample.columns)], columns=sample.columns),
+                        sample.iloc[25:]], ignore_index=True)
+    if extension == '.csv':
+        sample.to_csv(upload_path, index=False)
+    else:
+        sample.to_excel(upload_path, index=False)
+
+    whole = convert(app_module, monkeypatch, upload_path, str(tmp_path / 'whole.csv'), streaming=False)
+    streamed = convert(app_module, monkeypatch, upload_path, str(tmp_path / 'streamed.csv'), streaming=True)
+
+    assert streamed == whole
+    assert whole.count('\n') == len(sample)
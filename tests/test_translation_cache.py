@@ -0,0 +1,36 @@
+import itertools
+from types import SimpleNamespace
+
+import translationCache
+from conftest import SAMPLE, CountingTranslator
+from translationCache import TranslationCache
+
+
+def test_warm_cache_converts_repeat_invoice_without_translator(app_module, tmp_path):
+    first = CountingTranslator()
+    app_module.set_translation_backend(first)
+    app_module.convert_file(SAMPLE, str(tmp_path / 'first.csv'), vendor='KAISI')
+    assert first.calls > 0
+
+    repeat = CountingTranslator()
+    app_module.set_translation_backend(repeat)
+    app_module.convert_file(SAMPLE, str(tmp_path / 'repeat.csv'), vendor='KAISI')
+
+    assert repeat.calls == 0
+    assert (tmp_path / 'repeat.csv').read_bytes() == (tmp_path / 'first.csv').read_bytes()
+    assert app_module.translation_cache.stats()['hits'] == len(set(first.texts))
+
+
+def test_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    clock = itertools.count(1)
+    monkeypatch.setattr(translationCache, 'time', SimpleNamespace(time=lambda: float(next(clock))))
+    cache = TranslationCache(str(tmp_path / 'translation_cache.db'), max_entries=3)
+    for text in ('apple', 'pear', 'plum'):
+        cache.put_many({text: f"[zh-cn] {text}"}, 'en', 'zh-cn')
+
+    # Reading apple makes pear the least recently used entry
+    assert cache.get_many(['apple'], 'en', 'zh-cn') == {'apple': '[zh-cn] apple'}
+    cache.put_many({'fig': '[zh-cn] fig'}, 'en', 'zh-cn')
+
+    assert set(cache.get_many(['apple', 'pear', 'plum', 'fig'], 'en', 'zh-cn')) == {'apple', 'plum', 'fig'}
+    assert cache.stats()['entries'] == 3
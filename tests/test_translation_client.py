@@ -0,0 +1,56 @@
+import os
+import sys
+
+from conftest import TESTS_DIR
+
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), 'benchmarks'))
+
+from translation_stub import running_stub  # noqa: E402
+from translationCache import HttpTranslationBackend, TranslationCache, translate_unique  # noqa: E402
+from translationClient import AsyncTranslationClient, CircuitBreaker  # noqa: E402
+
+DESCRIPTIONS = [f"Description {number}" for number in range(40)]
+
+
+def translate(tmp_path, server, client, batch_size=1):
+    cache = TranslationCache(str(tmp_path / 'translation_cache.db'))
+    translations, passed_through = translate_unique(DESCRIPTIONS, cache, HttpTranslationBackend(server.url),
+                                                    'en', 'zh-cn', batch_size=batch_size, client=client)
+    return cache, translations, passed_through
+
+
+def test_requests_stay_within_the_concurrency_limit(tmp_path):
+    # More than the default executor's min(32, CPUs + 4) threads
+    client = AsyncTranslationClient(concurrency=36, rate=0)
+    with running_stub(latency=0.2) as server:
+        _, translations, passed_through = translate(tmp_path, server, client)
+
+    assert server.max_active == 36
+    assert not passed_through
+    assert translations['Description 7'] == '[zh-cn] Description 7'
+
+
+def test_failed_batches_are_retried(tmp_path):
+    client = AsyncTranslationClient(concurrency=4, rate=0, retries=10, backoff=0.001,
+                                    breaker=CircuitBreaker(failure_threshold=1000))
+    with running_stub(failure_rate=0.3) as server:
+        _, translations, passed_through = translate(tmp_path, server, client)
+
+    assert server.failures > 0
+    assert server.requests == len(DESCRIPTIONS) + server.failures
+    assert not passed_through
+    assert all(translations[text] == f"[zh-cn] {text}" for text in DESCRIPTIONS)
+
+
+def test_open_breaker_passes_text_through(tmp_path):
+    client = AsyncTranslationClient(concurrency=1, rate=0, retries=2, backoff=0.001,
+                                    breaker=CircuitBreaker(failure_threshold=3, reset_timeout=60))
+    with running_stub(failure_rate=1.0) as server:
+        cache, translations, passed_through = translate(tmp_path, server, client)
+
+    # The third failure opens the circuit; no batch reaches the translator after that
+    assert server.requests == 3
+    assert client.breaker.is_open()
+    assert passed_through == set(DESCRIPTIONS)
+    assert all(translations[text] == text for text in DESCRIPTIONS)
+    assert cache.get_many(DESCRIPTIONS, 'en', 'zh-cn') == {}
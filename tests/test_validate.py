@@ -0,0 +1,16 @@
+from conftest import SAMPLE
+
+
+def validate(app_module, rows):
+    with open(SAMPLE, 'rb') as sample:
+        response = app_module.app.test_client().post(
+            '/validate', data={'vendor': 'KAISI', 'rows': str(rows), 'file': (sample, 'kaisi_sample.csv')},
+            content_type='multipart/form-data')
+    return response.get_json()
+
+
+def test_validate_caps_rows_at_validation_max_rows(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'VALIDATION_MAX_ROWS', 5)
+
+    assert len(validate(app_module, 3)['preview']) == 3
+    assert len(validate(app_module, 50)['preview']) == 5
@@ -0,0 +1,157 @@
+import json
+import time
+import logging
+import urllib.request
+
+from sqliteStore import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+SQLITE_BATCH_SIZE = 500
+
+
+class GoogleTranslateBackend:
+    """Translate batches of text with googletrans."""
+
+    def __init__(self):
+        self._translator = None
+
+    def __getstate__(self):
+        # The googletrans client holds an HTTP session, so worker processes build their own
+        return {'_translator': None}
+
+    def translate_batch(self, texts, src, dest):
+        """Translate a list of texts and return the translations in the same order."""
+        if self._translator is None:
+            from googletrans import Translator
+            self._translator = Translator()
+        results = self._translator.translate(list(texts), src=src, dest=dest)
+        return [result.text for result in results]
+
+
+class HttpTranslationBackend:
+    """
+    Translate batches through an HTTP service: POST {"texts", "src", "dest"} as JSON,
+    answered with {"translations": [...]}. Used for self-hosted translators and local stub servers.
+    """
+
+    def __init__(self, url, timeout=30):
+        self.url = url
+        self.timeout = timeout
+
+    def translate_batch(self, texts, src, dest):
+        body = json.dumps({'texts': list(texts), 'src': src, 'dest': dest}).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            translations = json.load(response)['translations']
+        if len(translations) != len(texts):
+            raise ValueError(f"Translator returned {len(translations)} translations for {len(texts)} texts")
+        return translations
+
+
+class TranslationCache(SQLiteStore):
+    """Persistent source -> translation cache stored in SQLite with LRU eviction."""
+
+    SCHEMA = (
+        '''
+        CREATE TABLE IF NOT EXISTS translations (
+            source TEXT NOT NULL,
+            src TEXT NOT NULL,
+            dest TEXT NOT NULL,
+            translated TEXT NOT NULL,
+            last_used REAL NOT NULL,
+            PRIMARY KEY (source, src, dest)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used)',
+    )
+
+    def __init__(self, path, max_entries=100000):
+        super().__init__(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, texts, src, dest):
+        """Return a dict of cached translations for the given texts."""
+        texts = list(texts)
+        found = {}
+        with self._lock:
+            connection = self._connect()
+            for start in range(0, len(texts), SQLITE_BATCH_SIZE):
+                batch = texts[start:start + SQLITE_BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                rows = connection.execute(
+                    f'SELECT source, translated FROM translations '
+                    f'WHERE src = ? AND dest = ? AND source IN ({placeholders})',
+                    [src, dest, *batch]
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                connection.executemany(
+                    'UPDATE translations SET last_used = ? WHERE source = ? AND src = ? AND dest = ?',
+                    [(now, source, src, dest) for source in found]
+                )
+                connection.commit()
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+        return found
+
+    def put_many(self, translations, src, dest):
+        """Store translations and evict the least recently used entries over the size cap."""
+        if not translations:
+            return
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                'INSERT OR REPLACE INTO translations (source, src, dest, translated, last_used) VALUES (?, ?, ?, ?, ?)',
+                [(source, src, dest, translated, now) for source, translated in translations.items()]
+            )
+            count = connection.execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+            if count > self.max_entries:
+                connection.execute(
+                    'DELETE FROM translations WHERE rowid IN '
+                    '(SELECT rowid FROM translations ORDER BY last_used LIMIT ?)',
+                    (count - self.max_entries,)
+                )
+                logger.info(f"Evicted {count - self.max_entries} translation cache entries")
+            connection.commit()
+
+    def stats(self):
+        """Return the hit/miss counters and the number of cached entries."""
+        with self._lock:
+            entries = self._connect().execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+            return {'hits': self.hits, 'misses': self.misses, 'entries': entries}
+
+
+def translate_unique(texts, cache, backend, src, dest, batch_size=50, client=None):
+    """
+    Translate each unique text once, sending only cache misses to the backend in batches.
+    With a client the batches are sent concurrently, and a batch that fails keeps its original text.
+    Returns ({text: translation}, set of texts passed through untranslated).
+    """
+    unique_texts = list(dict.fromkeys(texts))
+    translations = cache.get_many(unique_texts, src, dest)
+    misses = [text for text in unique_texts if text not in translations]
+    batches = [misses[start:start + batch_size] for start in range(0, len(misses), batch_size)]
+    if client is None:
+        results = (backend.translate_batch(batch, src, dest) for batch in batches)
+    else:
+        results = client.translate_batches(backend, batches, src, dest)
+    passed_through = set()
+    for batch, result in zip(batches, results):
+        if result is None:
+            # Left out of the cache, so the next conversion tries the translator again
+            translations.update(zip(batch, batch))
+            passed_through.update(batch)
+            continue
+        translated = dict(zip(batch, result))
+        cache.put_many(translated, src, dest)
+        translations.update(translated)
+    logger.info(f"Translated {len(unique_texts)} unique texts: "
+                f"{len(unique_texts) - len(misses)} from cache, {len(misses) - len(passed_through)} from backend, "
+                f"{len(passed_through)} left untranslated")
+    return translations, passed_through
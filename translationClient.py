@@ -0,0 +1,148 @@
+import time
+import random
+import asyncio
+import logging
+from threading import Lock, BoundedSemaphore
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the translator while the circuit is open."""
+
+
+class TokenBucket:
+    """Rate limiter shared by every thread: rate tokens per second, up to burst saved up."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def reserve(self):
+        """Take a token and return how many seconds to wait before using it."""
+        if self.rate <= 0:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing translator: after failure_threshold failures in a row the circuit
+    opens for reset_timeout seconds, then one trial call decides whether it closes again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = Lock()
+
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None
+
+    def allow(self):
+        """Return True if a call may go ahead."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"Translator failed {self._failures} times in a row, opening the circuit")
+                self._opened_at = time.monotonic()
+
+
+class AsyncTranslationClient:
+    """
+    Send translation batches concurrently, within a concurrency limit and a token-bucket rate,
+    retrying failures with jittered exponential backoff. A batch that still fails, or that
+    arrives while the circuit is open, comes back as None so the caller can pass the text through.
+    """
+
+    def __init__(self, concurrency=4, rate=5, burst=10, retries=3, backoff=0.5, max_backoff=10,
+                 breaker=None, registry=None):
+        self.concurrency = max(concurrency, 1)
+        self._slots = BoundedSemaphore(self.concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.registry = registry
+
+    def _count(self, name, value=1):
+        if self.registry is not None:
+            self.registry.inc(name, value)
+
+    def _call(self, backend, batch, src, dest):
+        # A thread-level semaphore, so the limit holds across every conversion running at once
+        with self._slots:
+            # Checked once a slot is free, so batches queued behind a failing call skip the translator
+            if not self.breaker.allow():
+                raise CircuitOpenError()
+            # Recorded before the slot is released, so the next caller sees the outcome
+            try:
+                translated = backend.translate_batch(batch, src, dest)
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            return translated
+
+    async def _translate(self, backend, batch, src, dest):
+        for attempt in range(self.retries + 1):
+            if self.breaker.is_open() and attempt > 0:
+                break
+            await asyncio.sleep(self.bucket.reserve())
+            try:
+                translated = await asyncio.to_thread(self._call, backend, batch, src, dest)
+            except CircuitOpenError:
+                break
+            except Exception as e:
+                logger.warning(f"Translation attempt {attempt + 1} failed: {str(e)}")
+                if attempt == self.retries:
+                    break
+                self._count('translator_retries_total')
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+                continue
+            return translated
+        self._count('translator_passthrough_total', len(batch))
+        return None
+
+    async def _translate_all(self, backend, batches, src, dest):
+        # The default executor has only min(32, CPUs + 4) threads, which would cap the concurrency
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=self.concurrency))
+        return await asyncio.gather(*(self._translate(backend, batch, src, dest) for batch in batches))
+
+    def translate_batches(self, backend, batches, src, dest):
+        """Translate every batch and return a result per batch: the translations, or None on failure."""
+        if not batches:
+            return []
+        return asyncio.run(self._translate_all(backend, batches, src, dest))
@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import logging
+from datetime import datetime
+
+from sqliteStore import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+ENTRY_FIELDS = ('filename', 'vendor', 'timestamp', 'status', 'downloaded_at')
+FILE_FIELDS = ('filename', 'uploaded_at', 'size')
+
+
+class UploadHistoryStore(SQLiteStore):
+    """Upload history kept in SQLite, indexed by (vendor, filename) and timestamp."""
+
+    SCHEMA = (
+        '''
+        CREATE TABLE IF NOT EXISTS uploads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            vendor TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            status TEXT NOT NULL,
+            downloaded_at TEXT
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_uploads_vendor_filename ON uploads (vendor, filename)',
+        'CREATE INDEX IF NOT EXISTS idx_uploads_timestamp ON uploads (timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_uploads_vendor_id ON uploads (vendor, id)',
+        'CREATE INDEX IF NOT EXISTS idx_uploads_status_id ON uploads (status, id)',
+        'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)',
+        '''
+        CREATE TABLE IF NOT EXISTS upload_files (
+            vendor TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            uploaded_at TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            PRIMARY KEY (vendor, filename)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_upload_files_vendor_uploaded_at ON upload_files (vendor, uploaded_at)',
+        'CREATE INDEX IF NOT EXISTS idx_upload_files_vendor_size ON upload_files (vendor, size)',
+        '''
+        CREATE TABLE IF NOT EXISTS conversions (
+            content_hash TEXT NOT NULL,
+            vendor TEXT NOT NULL,
+            pipeline_version TEXT NOT NULL,
+            output_path TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (content_hash, vendor, pipeline_version)
+        )
+        ''',
+    )
+
+    def __init__(self, path, legacy_json_path=None):
+        super().__init__(path)
+        self.legacy_json_path = legacy_json_path
+
+    def _on_open(self, connection):
+        """Import the old upload_log.json the first time the database is opened."""
+        if not self.legacy_json_path or not os.path.exists(self.legacy_json_path):
+            return
+        migrated = connection.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+        if migrated:
+            return
+        try:
+            with open(self.legacy_json_path, 'r') as f:
+                logs = json.load(f)
+        except json.JSONDecodeError as e:
+            logger.error(f"Could not migrate {self.legacy_json_path}: {str(e)}")
+            logs = []
+        with connection:
+            connection.executemany(
+                'INSERT INTO uploads (filename, vendor, timestamp, status, downloaded_at) VALUES (?, ?, ?, ?, ?)',
+                [tuple(log.get(field) for field in ENTRY_FIELDS) for log in logs]
+            )
+            connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('json_migrated', ?)",
+                (datetime.now().strftime('%Y-%m-%d %H:%M:%S'),)
+            )
+            self._touch(connection)
+        logger.info(f"Migrated {len(logs)} upload log entries from {self.legacy_json_path}")
+
+    @staticmethod
+    def _touch(connection):
+        """Bump the revision counter inside the current write transaction."""
+        connection.execute(
+            "INSERT INTO meta (key, value) VALUES ('revision', '1') "
+            "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+        connection.execute(
+            "INSERT INTO meta (key, value) VALUES ('modified_at', ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (str(time.time()),)
+        )
+
+    def revision(self):
+        """Return (revision, modified_at) so callers can tell whether anything changed."""
+        with self._lock:
+            rows = dict(self._connect().execute(
+                "SELECT key, value FROM meta WHERE key IN ('revision', 'modified_at')"
+            ).fetchall())
+        return int(rows.get('revision', 0)), float(rows.get('modified_at', 0))
+
+    @staticmethod
+    def _to_entry(row):
+        """Turn a database row into the dict shape the history page expects."""
+        entry = dict(zip(ENTRY_FIELDS, row))
+        if entry['downloaded_at'] is None:
+            del entry['downloaded_at']
+        return entry
+
+    def log(self, filename, vendor, status):
+        """Append an upload entry and return it."""
+        entry = {
+            'filename': filename,
+            'vendor': vendor,
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'status': status
+        }
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    'INSERT INTO uploads (filename, vendor, timestamp, status) VALUES (?, ?, ?, ?)',
+                    (entry['filename'], entry['vendor'], entry['timestamp'], entry['status'])
+                )
+                self._touch(connection)
+        return entry
+
+    def mark_downloaded(self, vendor, filename):
+        """Mark every entry for a file as downloaded and return how many were updated."""
+        downloaded_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                cursor = connection.execute(
+                    "UPDATE uploads SET status = 'Downloaded', downloaded_at = ? WHERE vendor = ? AND filename = ?",
+                    (downloaded_at, vendor, filename)
+                )
+                if cursor.rowcount:
+                    self._touch(connection)
+        return cursor.rowcount
+
+    def update_status(self, vendor, filename, status):
+        """Set the status of the oldest entry for a file; returns False if there is none."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                cursor = connection.execute(
+                    'UPDATE uploads SET status = ? WHERE id = '
+                    '(SELECT MIN(id) FROM uploads WHERE vendor = ? AND filename = ?)',
+                    (status, vendor, filename)
+                )
+                if cursor.rowcount:
+                    self._touch(connection)
+        return cursor.rowcount > 0
+
+    def query(self, limit=100, cursor=None, vendor=None, status=None, date_from=None, date_to=None):
+        """
+        Return a page of entries, newest first, and the cursor for the next page.
+        status matches as a prefix, so 'failed' finds every 'failed: ...' entry.
+        """
+        conditions = []
+        params = []
+        if cursor is not None:
+            conditions.append('id < ?')
+            params.append(cursor)
+        if vendor:
+            conditions.append('vendor = ?')
+            params.append(vendor)
+        if status:
+            # A range instead of LIKE, so the (status, id) index can be used
+            conditions.append('status >= ? AND status < ?')
+            params.extend([status, status + '\uffff'])
+        if date_from:
+            conditions.append('timestamp >= ?')
+            params.append(date_from)
+        if date_to:
+            conditions.append('timestamp <= ?')
+            params.append(date_to)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT id, {', '.join(ENTRY_FIELDS)} FROM uploads {where} ORDER BY id DESC LIMIT ?",
+                [*params, limit + 1]
+            ).fetchall()
+        next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+        entries = []
+        for row in rows[:limit]:
+            entry = self._to_entry(row[1:])
+            entry['id'] = row[0]
+            entries.append(entry)
+        return entries, next_cursor
+
+    def find_conversion(self, content_hash, vendor, pipeline_version):
+        """Return the output path of an earlier conversion of the same bytes, or None."""
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT output_path FROM conversions WHERE content_hash = ? AND vendor = ? AND pipeline_version = ?',
+                (content_hash, vendor, pipeline_version)
+            ).fetchone()
+        return row[0] if row else None
+
+    def record_conversion(self, content_hash, vendor, pipeline_version, output_path):
+        """Remember where the converted output for these bytes was written."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO conversions '
+                    '(content_hash, vendor, pipeline_version, output_path, created_at) VALUES (?, ?, ?, ?, ?)',
+                    (content_hash, vendor, pipeline_version, output_path, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                )
+
+    def folder_version(self, vendor):
+        """Return the folder mtime the vendor's file index was last brought up to date with."""
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT value FROM meta WHERE key = ?', (f"files_mtime:{vendor}",)
+            ).fetchone()
+        return int(row[0]) if row else None
+
+    @staticmethod
+    def _set_folder_version(connection, vendor, folder_mtime):
+        connection.execute(
+            'INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value',
+            (f"files_mtime:{vendor}", str(folder_mtime))
+        )
+
+    def record_file(self, vendor, filename, uploaded_at, size, previous_mtime, folder_mtime):
+        """
+        Add a newly written upload to the vendor's file index. The index only moves on to
+        folder_mtime if it was up to date with the folder before the upload (previous_mtime);
+        otherwise something else changed the folder and the next listing has to rescan it.
+        """
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO upload_files (vendor, filename, uploaded_at, size) VALUES (?, ?, ?, ?)',
+                    (vendor, filename, uploaded_at, size)
+                )
+                connection.execute(
+                    'UPDATE meta SET value = ? WHERE key = ? AND value = ?',
+                    (str(folder_mtime), f"files_mtime:{vendor}", str(previous_mtime))
+                )
+
+    def replace_files(self, vendor, files, folder_mtime):
+        """Replace the vendor's file index with a fresh scan of (filename, uploaded_at, size) tuples."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('DELETE FROM upload_files WHERE vendor = ?', (vendor,))
+                connection.executemany(
+                    'INSERT INTO upload_files (vendor, filename, uploaded_at, size) VALUES (?, ?, ?, ?)',
+                    [(vendor, *file) for file in files]
+                )
+                self._set_folder_version(connection, vendor, folder_mtime)
+
+    def list_files(self, vendor, sort='uploaded_at', descending=True, limit=100, offset=0):
+        """Return (total, page of files) for a vendor from the file index."""
+        if sort not in FILE_FIELDS:
+            raise ValueError(f"Cannot sort by {sort}")
+        direction = 'DESC' if descending else 'ASC'
+        with self._lock:
+            connection = self._connect()
+            total = connection.execute('SELECT COUNT(*) FROM upload_files WHERE vendor = ?', (vendor,)).fetchone()[0]
+            rows = connection.execute(
+                f"SELECT {', '.join(FILE_FIELDS)} FROM upload_files WHERE vendor = ? "
+                f"ORDER BY {sort} {direction}, filename {direction} LIMIT ? OFFSET ?",
+                (vendor, limit, offset)
+            ).fetchall()
+        return total, [dict(zip(FILE_FIELDS, row)) for row in rows]
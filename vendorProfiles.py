@@ -0,0 +1,96 @@
+import re
+
+
+def header_fingerprint(columns):
+    """Normalise a header row into a hashable fingerprint."""
+    return frozenset(str(column).strip().lower() for column in columns)
+
+
+class VendorProfile:
+    """
+    How to read one vendor's invoices: column renames, cleaning rules, the quantity
+    multiplier pattern and price semantics. Patterns are compiled once, when the profile is built.
+    """
+
+    def __init__(self, name, column_map, description_cleanup=(), barcode_cleanup=r'-',
+                 multiplier_pattern=r'\*(\d+)', price_is_total=True,
+                 required_columns=('Description', 'Qty', 'Price'),
+                 description_hints=('desc',), barcode_hints=('barcode', 'code')):
+        self.name = name
+        self.column_map = dict(column_map)
+        self.required_columns = tuple(required_columns)
+        # Where each required column comes from in the vendor's own header
+        self.source_columns = {target: source for source, target in self.column_map.items()}
+        self.description_patterns = [re.compile(pattern) for pattern in description_cleanup]
+        self.barcode_pattern = re.compile(barcode_cleanup) if barcode_cleanup else None
+        self.multiplier_pattern = re.compile(multiplier_pattern) if multiplier_pattern else None
+        # True when the invoice price is for the whole line, so SinglePrice = Price / Qty
+        self.price_is_total = price_is_total
+        self.description_hints = tuple(description_hints)
+        self.barcode_hints = tuple(barcode_hints)
+        self.fingerprint = header_fingerprint(self.column_map)
+
+
+KAISI = VendorProfile(
+    'KAISI',
+    column_map={
+        'Description1': 'Description',
+        'StockQty': 'Qty',
+        'StockPrice': 'Price',  # Map StockPrice instead of SalesPrice1
+        'Barcode1': 'Barcode',
+    },
+    description_cleanup=(
+        r'[箱\\P#]',
+        r'\*[^Kg]*',
+        r'^\d+\.',
+        r'\b\d{3}\b',
+        r'\.\d{2}\.',
+        r'^[^\w\d]+',
+    ),
+)
+
+DEFAULT_PROFILE = KAISI
+
+# Columns kept as text whatever their cells hold
+TEXT_COLUMNS = ('Barcode', 'Description')
+
+VENDOR_PROFILES = {}
+# Header fingerprint (restricted to the columns profiles know about) -> profile
+_FINGERPRINT_INDEX = {}
+_SIGNATURE_COLUMNS = set()
+
+
+def register_profile(profile):
+    """Add a profile to the registry and the header-fingerprint index."""
+    VENDOR_PROFILES[profile.name.upper()] = profile
+    _FINGERPRINT_INDEX[profile.fingerprint] = profile
+    _SIGNATURE_COLUMNS.update(profile.fingerprint)
+
+
+def get_profile(vendor):
+    """Return the profile registered for a vendor name, or None."""
+    return VENDOR_PROFILES.get(str(vendor or '').strip().upper())
+
+
+def detect_profile(columns):
+    """
+    Find the profile whose columns appear in a header. Only columns some profile
+    knows about take part, so the lookup is one dict access however many vendors exist.
+    """
+    return _FINGERPRINT_INDEX.get(header_fingerprint(columns) & _SIGNATURE_COLUMNS)
+
+
+def header_names(targets):
+    """Header names, across every registered profile, of the columns mapped to the given Enrich columns."""
+    columns = set(targets)
+    for profile in VENDOR_PROFILES.values():
+        columns.update(source for source, target in profile.column_map.items() if target in targets)
+    return columns
+
+
+def resolve_profile(vendor, columns):
+    """Pick a profile by vendor name, then by header, falling back to the default profile."""
+    return get_profile(vendor) or detect_profile(columns) or DEFAULT_PROFILE
+
+
+register_profile(KAISI)